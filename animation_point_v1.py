@@ -2,7 +2,7 @@ import pygame
 import pandas as pd
 import tkinter as tk
 from tkinter import filedialog, simpledialog
-from pyproj import Transformer, CRS
+from naiad_io import DETECT_SAMPLE_ROWS, detect_time_column, reproject_to_wgs84
 import sys
 import datetime
 import math
@@ -23,15 +23,6 @@ def detect_columns(df):
             return x, y
     return None, None
 
-def detect_time_column(df):
-    for col in df.columns:
-        try:
-            pd.to_datetime(df[col])
-            return col
-        except:
-            continue
-    return None
-
 def prompt_manual_column_selection(df):
     col_names = df.columns.tolist()
     x_col = simpledialog.askstring("Manual Column Selection", f"Enter X (Longitude) column:\n{col_names}")
@@ -46,7 +37,7 @@ def load_and_process_csv():
 
     df = pd.read_csv(file_path)
     x_col, y_col = detect_columns(df)
-    t_col = detect_time_column(df)
+    t_col = detect_time_column(df.head(DETECT_SAMPLE_ROWS))
 
     override = simpledialog.askstring("Override", "Manual override column detection? (yes/no)").lower()
     if override == "yes":
@@ -56,9 +47,8 @@ def load_and_process_csv():
     df[t_col] = pd.to_datetime(df[t_col])
 
     projection_input = simpledialog.askstring("Projection", "Enter projection (e.g., EPSG:4326)", initialvalue="EPSG:4326")
-    transformer = Transformer.from_crs(CRS(projection_input), CRS("EPSG:4326"), always_xy=True)
 
-    df['lon'], df['lat'] = zip(*df.apply(lambda row: transformer.transform(row[x_col], row[y_col]), axis=1))
+    reproject_to_wgs84(df, x_col, y_col, projection_input)
     df['timestamp'] = df[t_col]
 
     id_col = None
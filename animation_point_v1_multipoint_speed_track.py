@@ -4,7 +4,7 @@ import pygame
 import pandas as pd
 import tkinter as tk
 from tkinter import filedialog, simpledialog
-from pyproj import Transformer, CRS
+from naiad_io import reproject_to_wgs84
 import sys
 import datetime
 import math
@@ -58,8 +58,7 @@ def load_and_process_csv():
     df[t_col] = pd.to_datetime(df[t_col])
 
     projection_input = simpledialog.askstring("Projection", "Enter projection (e.g., EPSG:4326)", initialvalue="EPSG:4326")
-    transformer = Transformer.from_crs(CRS(projection_input), CRS("EPSG:4326"), always_xy=True)
-    df['lon'], df['lat'] = zip(*df.apply(lambda row: transformer.transform(row[x_col], row[y_col]), axis=1))
+    reproject_to_wgs84(df, x_col, y_col, projection_input)
     df['timestamp'] = df[t_col]
 
     id_col = None
@@ -2,13 +2,23 @@
 
 import pygame
 import pandas as pd
+import numpy as np
 import tkinter as tk
 from tkinter import filedialog, simpledialog
-from pyproj import Transformer, CRS
+from naiad_io import TRAJECTORY_FILE_EXTENSION, TrajectoryCache, detect_columns, open_trajectory_file, stream_csv
+from naiad_tracks import FixedStepScheduler, PlaybackClock, Timeline, TrajectoryStore
+from naiad_render import SPEED_COLOR_STOPS, Compositor, HudText, TrailLayer, TrailPyramid, TrailShading, ViewTransform, build_color_lut
+from naiad_export import concat_videos, is_video_output, open_frame_writer
+from naiad_kinematics import Kinematics, write_kinematics
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import gc
+import tempfile
+import threading
 import sys
 import datetime
-import math
 import os
+import time
 
 # Constants
 WINDOW_WIDTH, WINDOW_HEIGHT = 1280, 720
@@ -19,14 +29,25 @@ BUTTON_WIDTH = 150
 BUTTON_HEIGHT = 40
 MARGIN = 10
 
-SPEED_INCREMENT = 0.1
-MIN_SPEED = 0.1
-MAX_SPEED = 2.0
-DEFAULT_SPEED = 1.0
-
-# Initialize Tkinter
-root = tk.Tk()
-root.withdraw()
+# Speed is mission seconds per wall-clock second; the buttons step it by SPEED_FACTOR
+SPEED_FACTOR = 2.0
+MIN_SPEED = 1.0
+MAX_SPEED = 3600.0 * 8
+DEFAULT_SPEED = 60.0
+SIM_STEP = 1 / 120  # Wall seconds per fixed simulation step
+ZOOM_STEP = 1.25
+MIN_ZOOM = 0.5
+MAX_ZOOM = 100000.0
+INTERPOLATE_PATHS = False  # Pre-expand tracks with naiad_tracks.interpolate_track (denser trails, same positions)
+EXPORT_FPS = 30
+EXPORT_CHUNKS_PER_PROCESS = 4
+PROGRESS_COLOR = (100, 200, 100)
+LOAD_PROGRESS_COLOR = (220, 160, 60)
+LOAD_PUBLISH_SECONDS = 1.0  # Minimum wall time between partial stores shown while loading
+LOAD_PUBLISH_RATIO = 4.0  # ...and at least this many times what the last one took to build
+LOAD_EVENT = pygame.USEREVENT + 1
+TRAIL_MODES = ("track", "speed", "time")  # Trail colouring, cycled by the Trail Colour button
+TRAIL_LUT = build_color_lut(SPEED_COLOR_STOPS)
 
 # Load a background map image (optional)
 def load_map_background():
@@ -48,194 +69,494 @@ def prompt_manual_column_selection(df):
 # Load CSV and apply projection
 
 def load_and_process_csv():
-    file_path = filedialog.askopenfilename(title="Select CSV", filetypes=[("CSV Files", "*.csv")])
+    # Only asks what to load: (file_path, x_col, y_col, t_col, projection).
+    # The rows are read by BackgroundLoader once the window is open.
+    # Tkinter is only initialised here so headless export never needs a display
+    root = tk.Tk()
+    root.withdraw()
+
+    file_path = filedialog.askopenfilename(title="Select CSV", filetypes=[("CSV Files", "*.csv"), ("NAIAD Trajectories", f"*{TRAJECTORY_FILE_EXTENSION}")])
     if not file_path:
         sys.exit("No file selected.")
+    if file_path.endswith(TRAJECTORY_FILE_EXTENSION):
+        root.destroy()
+        return file_path, None, None, None, None
+
+    # Detection reads only a row sample; the prompts appear only for what it
+    # could not settle (always for the projection of projected x/y columns)
+    x_col, y_col, t_col, _, projection_input = detect_columns(file_path)
+    if not (x_col and y_col and t_col):
+        x_col, y_col, t_col = prompt_manual_column_selection(pd.read_csv(file_path, nrows=0))
+        projection_input = None
+    if not projection_input:
+        projection_input = simpledialog.askstring("Projection", "Enter projection (e.g., EPSG:4326)", initialvalue="EPSG:4326")
+    root.destroy()
+
+    return file_path, x_col, y_col, t_col, projection_input
+
+def load_trajectory_store(file_path, x_col, y_col, t_col, projection_input, progress=None):
+    # Returns (store, pyramid, kinematics). What took a pass over the whole
+    # file to build (a CSV's store, the trail pyramid levels, the
+    # kinematics) is cached and memory-mapped on later opens. The cache is
+    # optional: a read-only or full cache directory only means the work is
+    # done again next time.
+    ntrk = file_path.endswith(TRAJECTORY_FILE_EXTENSION)
+    store = open_trajectory_file(file_path) if ntrk else None
+    cache = TrajectoryCache()
+    options = (WINDOW_WIDTH, WINDOW_HEIGHT) if ntrk else (WINDOW_WIDTH, WINDOW_HEIGHT, x_col, y_col, t_col, projection_input, INTERPOLATE_PATHS)
+    key = cache.key(file_path, *options)
+
+    def load(directory):
+        mapped = store if ntrk else TrajectoryStore.load(directory, allow_pickle=False)
+        return mapped, TrailPyramid.load(directory, mapped, WINDOW_WIDTH, WINDOW_HEIGHT), Kinematics.load(directory)
 
-    df = pd.read_csv(file_path)
-    x_col, y_col, t_col = prompt_manual_column_selection(df)
-    df = df.dropna(subset=[x_col, y_col, t_col])
-    df[t_col] = pd.to_datetime(df[t_col])
-
-    projection_input = simpledialog.askstring("Projection", "Enter projection (e.g., EPSG:4326)", initialvalue="EPSG:4326")
-    transformer = Transformer.from_crs(CRS(projection_input), CRS("EPSG:4326"), always_xy=True)
-    df['lon'], df['lat'] = zip(*df.apply(lambda row: transformer.transform(row[x_col], row[y_col]), axis=1))
-    df['timestamp'] = df[t_col]
-
-    id_col = None
-    for col in df.columns:
-        if "id" in col.lower():
-            id_col = col
-            break
-
-    if not id_col:
-        df['id'] = 0  # Single track fallback
-    else:
-        df['id'] = df[id_col]
-
-    return df
+    try:
+        cached = cache.get(key, load)
+    except OSError:
+        cached = None
+    if cached:
+        return cached
+
+    if store is None:
+        store = stream_csv(file_path, x_col, y_col, t_col, projection_input, INTERPOLATE_PATHS, progress=progress)
+    pyramid = TrailPyramid(store, WINDOW_WIDTH, WINDOW_HEIGHT)
+
+    def save(directory):
+        if not ntrk:
+            store.save(directory, allow_pickle=False)
+        pyramid.save(directory)
+        write_kinematics(store, directory)
+
+    # The kinematics go straight to the cache entry and are mapped back
+    # from there; only without a cache are they held in memory
+    try:
+        cache.put(key, save)
+        cached = cache.get(key, load)
+    except (OSError, ValueError) as e:
+        print(f"Trajectory cache not written: {e}", file=sys.stderr)
+    return cached or (store, pyramid, Kinematics(store))
+
+# Background loading
+
+class BackgroundLoader:
+    # Reads the selected file on a worker thread while the window is up.
+    # Now and then a partial store (tracks read so far), its trail pyramid
+    # and kinematics are published as snapshot, and version is bumped;
+    # LOAD_EVENT wakes the event loop whenever something changed. Each
+    # partial store rebuilds everything read so far, so the wait before the
+    # next one grows with what the last one cost (LOAD_PUBLISH_RATIO) and
+    # publishing stays a bounded share of the load however large the file.
+
+    def __init__(self, source):
+        self.source = source
+        self.progress = 0.0
+        self.snapshot = None
+        self.version = 0
+        self.done = False
+        self.error = None
+        self.next_publish = 0.0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _notify(self):
+        pygame.event.post(pygame.event.Event(LOAD_EVENT))
+
+    def _publish(self, store, pyramid=None, kinematics=None):
+        self.snapshot = (store, pyramid or TrailPyramid(store, WINDOW_WIDTH, WINDOW_HEIGHT), kinematics or Kinematics(store))
+        self.version += 1
+
+    def _on_chunk(self, fraction, builder):
+        self.progress = fraction
+        start = time.perf_counter()
+        if start >= self.next_publish:
+            self._publish(builder.build(INTERPOLATE_PATHS, release=False))
+            end = time.perf_counter()
+            self.next_publish = end + max(LOAD_PUBLISH_SECONDS, LOAD_PUBLISH_RATIO * (end - start))
+        self._notify()
+
+    def _run(self):
+        try:
+            self._publish(*load_trajectory_store(*self.source, progress=self._on_chunk))
+            self.progress = 1.0
+        except Exception as e:
+            self.error = e
+        self.done = True
+        self._notify()
 
-# Coordinate conversion
+# Draw progress bar
 
-def latlon_to_screen(lat, lon):
-    x = (lon + 180) * (WINDOW_WIDTH / 360)
-    y = (90 - lat) * (WINDOW_HEIGHT / 180)
-    return int(x), int(y)
+def draw_progress_bar(screen, progress, color=PROGRESS_COLOR):
+    progress_width = int(WINDOW_WIDTH * progress)
+    pygame.draw.rect(screen, color, (0, WINDOW_HEIGHT - PROGRESS_BAR_HEIGHT, progress_width, PROGRESS_BAR_HEIGHT))
+    return pygame.draw.rect(screen, (255, 255, 255), (0, WINDOW_HEIGHT - PROGRESS_BAR_HEIGHT, WINDOW_WIDTH, PROGRESS_BAR_HEIGHT), 2)
 
-# Interpolation
+# Button rendering
 
-def interpolate_points(p1, p2, t1, t2, steps=10):
-    result = []
-    for i in range(steps):
-        f = i / steps
-        lon = p1[0] + f * (p2[0] - p1[0])
-        lat = p1[1] + f * (p2[1] - p1[1])
-        timestamp = t1 + (t2 - t1) * f
-        result.append((lon, lat, timestamp))
-    return result
+def draw_button(screen, text, x, y, width, height, color, hud):
+    pygame.draw.rect(screen, color, (x, y, width, height))
+    label = hud.label(text)
+    screen.blit(label, (x + (width - label.get_width()) // 2, y + (height - label.get_height()) // 2))
 
-# Step calculation
+# Static layers
 
-def calculate_steps(p1, p2, t1, t2):
-    dist = math.hypot(p2[0] - p1[0], p2[1] - p1[1])
-    time_diff = (t2 - t1).total_seconds()
-    return max(5, min(50, int(dist * time_diff / 1000)))
+def build_background(map_bg):
+    background = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT)).convert()
+    if map_bg:
+        background.blit(map_bg, (0, 0))
+    else:
+        background.fill(OCEAN_COLOR)
+    return background
+
+def build_button_panel(hud, trail_mode=TRAIL_MODES[0]):
+    panel = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA).convert_alpha()
+    draw_button(panel, "Pause", WINDOW_WIDTH - BUTTON_WIDTH - 10, 10, BUTTON_WIDTH, BUTTON_HEIGHT, (50,150,50), hud)
+    draw_button(panel, "Replay", WINDOW_WIDTH - BUTTON_WIDTH - 10, 60, BUTTON_WIDTH, BUTTON_HEIGHT, (50,150,50), hud)
+    draw_button(panel, "Faster", WINDOW_WIDTH - BUTTON_WIDTH - 10, 110, BUTTON_WIDTH, BUTTON_HEIGHT, (50,150,50), hud)
+    draw_button(panel, "Slower", WINDOW_WIDTH - BUTTON_WIDTH - 10, 160, BUTTON_WIDTH, BUTTON_HEIGHT, (50,150,50), hud)
+    draw_button(panel, "Reset Speed", WINDOW_WIDTH - BUTTON_WIDTH - 10, 210, BUTTON_WIDTH, BUTTON_HEIGHT, (50,150,50), hud)
+    draw_button(panel, "Toggle Trail", WINDOW_WIDTH - BUTTON_WIDTH - 10, 260, BUTTON_WIDTH, BUTTON_HEIGHT, (100,100,200), hud)
+    draw_button(panel, f"Colour: {trail_mode.title()}", WINDOW_WIDTH - BUTTON_WIDTH - 10, 310, BUTTON_WIDTH, BUTTON_HEIGHT, (100,100,200), hud)
+    return panel
+
+# Scene rendering
+
+class Scene:
+    # Everything drawn for one instant of the mission; shared by the
+    # interactive viewer and the headless exporter
+
+    def __init__(self, screen, store, hud, map_bg, pyramid=None, kinematics=None):
+        self.screen = screen
+        self.hud = hud
+        self.view = ViewTransform(WINDOW_WIDTH, WINDOW_HEIGHT)
+        self.trail_layer = TrailLayer((WINDOW_WIDTH, WINDOW_HEIGHT))
+        self.trail_mode = TRAIL_MODES[0]
+        self.compositor = Compositor(screen, build_background(map_bg), build_button_panel(hud))
+        self.set_store(store, pyramid, kinematics)
+
+    def set_store(self, store, pyramid=None, kinematics=None):
+        # Also used to swap in the growing partial stores while loading
+        color_palette = [(255,0,0),(0,255,0),(0,0,255),(255,255,0),(0,255,255),(255,0,255)]
+        self.store = store
+        self.timeline = Timeline(store)
+        self.colors = [color_palette[i % len(color_palette)] for i in range(len(store))]
+        self.label_rows = [(10, 10 + t * 20) for t in range(len(store))]
+        self.pyramid = pyramid or TrailPyramid(store, WINDOW_WIDTH, WINDOW_HEIGHT)
+        self.kinematics = kinematics or Kinematics(store)
+        self.shadings = {}
+        self.trail_layer.invalidate()
+        self.compositor.invalidate()
+
+    def set_trail_mode(self, mode):
+        self.trail_mode = mode
+        self.compositor.overlay = build_button_panel(self.hud, mode)
+        self.trail_layer.invalidate()
+        self.compositor.invalidate()
+
+    def shading(self):
+        # TrailShading for the current mode (None for flat track colours),
+        # built on first use for each store
+        if self.trail_mode == "track":
+            return None
+        shading = self.shadings.get(self.trail_mode)
+        if shading is None:
+            if self.trail_mode == "speed":
+                shading = TrailShading(self.kinematics.speed_mps, TRAIL_LUT)
+            else:
+                shading = TrailShading(self.store.time_ns, TRAIL_LUT, self.timeline.start_ns, self.timeline.end_ns)
+            self.shadings[self.trail_mode] = shading
+        return shading
 
-# Draw progress bar
+    def draw(self, time_ns, progress, show_trail, bar_color=PROGRESS_COLOR):
+        screen, store, view, colors, lengths = self.screen, self.store, self.view, self.colors, self.timeline.lengths
+        positions = [store.locate(t, time_ns) for t in range(len(store))]
+        head_xs, head_ys = view.project([p[1] for p in positions], [p[2] for p in positions])
 
-def draw_progress_bar(screen, progress):
-    progress_width = int(WINDOW_WIDTH * progress)
-    pygame.draw.rect(screen, (100, 200, 100), (0, WINDOW_HEIGHT - PROGRESS_BAR_HEIGHT, progress_width, PROGRESS_BAR_HEIGHT))
-    pygame.draw.rect(screen, (255, 255, 255), (0, WINDOW_HEIGHT - PROGRESS_BAR_HEIGHT, WINDOW_WIDTH, PROGRESS_BAR_HEIGHT), 2)
+        shading = self.shading() if show_trail else None
+        if show_trail:
+            self.compositor.begin(self.trail_layer.surface, self.trail_layer.update(store, [p[0] for p in positions], colors, view, self.pyramid, shading))
+        else:
+            self.compositor.begin()
+        drawn = []
 
-# Button rendering
+        # Index of every track's current segment, also used for its kinematics
+        last = store.offsets[:-1] + np.maximum(np.array([p[0] for p in positions], dtype=np.int64) - 1, 0)
+        speeds = self.kinematics.speed_mps[last]
+        headings = self.kinematics.heading_deg[last]
 
-def draw_button(screen, text, x, y, width, height, color, font):
-    pygame.draw.rect(screen, color, (x, y, width, height))
-    label = font.render(text, True, (255, 255, 255))
-    screen.blit(label, (x + (width - label.get_width()) // 2, y + (height - label.get_height()) // 2))
+        if show_trail:
+            # The segment into the interpolated head moves every frame, so it is not cached
+            tail_xs, tail_ys = view.project(store.lon[last], store.lat[last])
+            if shading:
+                tail_colors = [tuple(c) for c in shading.lut[shading.index(shading.values[last])].tolist()]
+            else:
+                tail_colors = colors
+            for t, (k, _, _, _) in enumerate(positions):
+                if 0 < k < lengths[t]:
+                    drawn.append(pygame.draw.line(screen, tail_colors[t], (int(tail_xs[t]), int(tail_ys[t])), (int(head_xs[t]), int(head_ys[t])), 2))
+
+        on_screen = (head_xs > -5) & (head_xs < WINDOW_WIDTH + 5) & (head_ys > -5) & (head_ys < WINDOW_HEIGHT + 5)
+        for t, track_id in enumerate(store.track_ids):
+            _, lon, lat, sample_ns = positions[t]
+            if on_screen[t]:
+                drawn.append(pygame.draw.circle(screen, colors[t], (int(head_xs[t]), int(head_ys[t])), 5))
+            if self.label_rows[t][1] < WINDOW_HEIGHT:  # Labels of later tracks would fall below the window
+                drawn.append(screen.blit(self.hud.track_label(t, track_id, lon, lat, sample_ns, speeds[t], headings[t]), self.label_rows[t]))
+
+        drawn.append(draw_progress_bar(screen, progress, bar_color))
+        self.compositor.end(drawn)
 
 # Main function
 
 def main():
-    df = load_and_process_csv()
-    grouped_paths = {}
-    colors = {}
-    color_palette = [(255,0,0),(0,255,0),(0,0,255),(255,255,0),(0,255,255),(255,0,255)]
-
-    for i, (track_id, group) in enumerate(df.groupby("id")):
-        path = []
-        group = group.sort_values("timestamp")
-        for j in range(len(group) - 1):
-            p1 = (group.iloc[j]['lon'], group.iloc[j]['lat'])
-            p2 = (group.iloc[j+1]['lon'], group.iloc[j+1]['lat'])
-            t1 = group.iloc[j]['timestamp']
-            t2 = group.iloc[j+1]['timestamp']
-            steps = calculate_steps(p1, p2, t1, t2)
-            path.extend(interpolate_points(p1, p2, t1, t2, steps))
-        grouped_paths[track_id] = path
-        colors[track_id] = color_palette[i % len(color_palette)]
-
-    all_path = sum(grouped_paths.values(), [])
-    total_frames = len(all_path)
+    source = load_and_process_csv()
 
     pygame.init()
     screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
     pygame.display.set_caption("Geospatial Point Animation")
     font = pygame.font.SysFont(None, 24)
     clock = pygame.time.Clock()
-    map_bg = load_map_background()
+
+    # The window opens on an empty scene; tracks appear as the loader publishes them
+    loader = BackgroundLoader(source)
+    loader.start()
+    loaded_version = 0
+    scene = Scene(screen, TrajectoryStore.from_tracks([]), HudText(font), load_map_background())
+    playback = PlaybackClock(scene.timeline)
+    view = scene.view
+    compositor = scene.compositor
 
     running = True
-    frame = 0
+    scheduler = FixedStepScheduler(SIM_STEP)
     paused = False
     speed = DEFAULT_SPEED
     show_trail = True
-    captured_frames = []
-    zoom = 1.0
-    pan_x, pan_y = 0, 0
     dragging = False
     drag_start = (0, 0)
+    scrubbing = False
+    drawn_ns = None
 
     while running:
-        for event in pygame.event.get():
+        if (paused or playback.finished) and drawn_ns == playback.time_ns and not compositor.full:
+            # Paused, or the last frame of the mission is already on screen:
+            # nothing can change until there is input, so sleep instead of spinning
+            events = [pygame.event.wait()] + pygame.event.get()
+            clock.tick()
+        else:
+            events = pygame.event.get()
+
+        if loader.error:
+            raise loader.error
+        if loader.version != loaded_version:
+            loaded_version = loader.version
+            store, pyramid, kinematics = loader.snapshot
+            # Playback keeps its mission time across partial stores
+            time_ns = playback.time_ns if len(scene.store) else None
+            scene.set_store(store, pyramid, kinematics)
+            playback = PlaybackClock(scene.timeline)
+            if time_ns is not None:
+                playback.seek(time_ns)
+            # What is loaded lives until exit; frozen objects are skipped by
+            # the collector, whose full passes otherwise stall frames by tens of ms
+            gc.freeze()
+
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.WINDOWEXPOSED:
+                compositor.invalidate()
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:  # Left click for buttons
                     x, y = event.pos
-                    if WINDOW_WIDTH - BUTTON_WIDTH - 10 <= x <= WINDOW_WIDTH - 10:
+                    if y >= WINDOW_HEIGHT - PROGRESS_BAR_HEIGHT and loader.done:
+                        # Press on the progress bar starts scrubbing
+                        scrubbing = True
+                        playback.seek(scene.timeline.time_at(x / WINDOW_WIDTH))
+                    elif WINDOW_WIDTH - BUTTON_WIDTH - 10 <= x <= WINDOW_WIDTH - 10:
                         if 10 <= y <= 10 + BUTTON_HEIGHT:
                             paused = not paused
                         elif 60 <= y <= 60 + BUTTON_HEIGHT:
-                            frame = 0
+                            playback.reset()
                             paused = False
                         elif 110 <= y <= 110 + BUTTON_HEIGHT:
-                            speed = min(speed + SPEED_INCREMENT, MAX_SPEED)
+                            speed = min(speed * SPEED_FACTOR, MAX_SPEED)
                         elif 160 <= y <= 160 + BUTTON_HEIGHT:
-                            speed = max(speed - SPEED_INCREMENT, MIN_SPEED)
+                            speed = max(speed / SPEED_FACTOR, MIN_SPEED)
                         elif 210 <= y <= 210 + BUTTON_HEIGHT:
                             speed = DEFAULT_SPEED
                         elif 260 <= y <= 260 + BUTTON_HEIGHT:
                             show_trail = not show_trail
+                            compositor.invalidate()
+                        elif 310 <= y <= 310 + BUTTON_HEIGHT:
+                            scene.set_trail_mode(TRAIL_MODES[(TRAIL_MODES.index(scene.trail_mode) + 1) % len(TRAIL_MODES)])
                 elif event.button == 3:
                     dragging = True
                     drag_start = event.pos
                 elif event.button == 4:
-                    zoom = min(2.0, zoom + 0.1)
+                    view.zoom_to(min(MAX_ZOOM, view.zoom * ZOOM_STEP), event.pos)
                 elif event.button == 5:
-                    zoom = max(0.5, zoom - 0.1)
+                    view.zoom_to(max(MIN_ZOOM, view.zoom / ZOOM_STEP), event.pos)
             elif event.type == pygame.MOUSEBUTTONUP:
-                if event.button == 3:
+                if event.button == 1:
+                    scrubbing = False
+                elif event.button == 3:
                     dragging = False
+            elif event.type == pygame.MOUSEMOTION and scrubbing:
+                playback.seek(scene.timeline.time_at(event.pos[0] / WINDOW_WIDTH))
             elif event.type == pygame.MOUSEMOTION and dragging:
                 dx, dy = event.rel
-                pan_x += dx
-                pan_y += dy
+                view.pan_by(dx, dy)
 
         # --- Drawing ---
-        if map_bg:
-            screen.blit(map_bg, (0, 0))
+        if loader.done:
+            scene.draw(playback.time_ns, playback.progress, show_trail)
         else:
-            screen.fill(OCEAN_COLOR)
+            scene.draw(playback.time_ns, loader.progress, show_trail, LOAD_PROGRESS_COLOR)
+        drawn_ns = playback.time_ns
 
-        if show_trail:
-            for track_id, path in grouped_paths.items():
-                for i in range(1, min(int(frame), len(path))):
-                    x1, y1 = latlon_to_screen(path[i-1][1], path[i-1][0])
-                    x2, y2 = latlon_to_screen(path[i][1], path[i][0])
-                    pygame.draw.line(screen, colors[track_id], (x1+pan_x, y1+pan_y), (x2+pan_x, y2+pan_y), 2)
-
-        for track_id, path in grouped_paths.items():
-            if int(frame) < len(path):
-                lon, lat, timestamp = path[int(frame)]
-            else:
-                lon, lat, timestamp = path[-1]
-            x, y = latlon_to_screen(lat, lon)
-            pygame.draw.circle(screen, colors[track_id], (x + pan_x, y + pan_y), 5)
-            text = f"Track {track_id}, Lon: {lon:.2f}, Lat: {lat:.2f}, Time: {timestamp.strftime('%H:%M:%S')}"
-            label = font.render(text, True, (255, 255, 255))
-            screen.blit(label, (10, 10 + list(grouped_paths).index(track_id) * 20))
-
-        if not paused:
-            frame += speed
-            if frame >= total_frames:
-                frame = total_frames - 1
-
-        draw_progress_bar(screen, frame / total_frames)
-
-        # Buttons
-        draw_button(screen, "Pause", WINDOW_WIDTH - BUTTON_WIDTH - 10, 10, BUTTON_WIDTH, BUTTON_HEIGHT, (50,150,50), font)
-        draw_button(screen, "Replay", WINDOW_WIDTH - BUTTON_WIDTH - 10, 60, BUTTON_WIDTH, BUTTON_HEIGHT, (50,150,50), font)
-        draw_button(screen, "Faster", WINDOW_WIDTH - BUTTON_WIDTH - 10, 110, BUTTON_WIDTH, BUTTON_HEIGHT, (50,150,50), font)
-        draw_button(screen, "Slower", WINDOW_WIDTH - BUTTON_WIDTH - 10, 160, BUTTON_WIDTH, BUTTON_HEIGHT, (50,150,50), font)
-        draw_button(screen, "Reset Speed", WINDOW_WIDTH - BUTTON_WIDTH - 10, 210, BUTTON_WIDTH, BUTTON_HEIGHT, (50,150,50), font)
-        draw_button(screen, "Toggle Trail", WINDOW_WIDTH - BUTTON_WIDTH - 10, 260, BUTTON_WIDTH, BUTTON_HEIGHT, (100,100,200), font)
-
-        pygame.display.flip()
+        # Mission time follows the wall clock in fixed steps however long the
+        # frame took; the steps a slow frame missed are merged into this one
         clock.tick(FPS)
+        steps = scheduler.steps(clock.get_time() / 1000)
+        if not (paused or scrubbing):
+            playback.advance(steps * SIM_STEP * speed)
 
     pygame.quit()
 
+# Headless export
+
+def export_step_ns(fps, speed):
+    return max(1, int(speed / fps * 1e9))
+
+def export_frame_count(timeline, fps, speed):
+    # Frame i shows mission time start + i * step, with the last frame at the end
+    return -(-timeline.duration_ns // export_step_ns(fps, speed)) + 1
+
+def open_export_scene(store, trail_mode=TRAIL_MODES[0], pyramid=None, kinematics=None):
+    # The SDL dummy driver renders without a display
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    scene = Scene(screen, store, HudText(pygame.font.SysFont(None, 24)), load_map_background(), pyramid, kinematics)
+    scene.set_trail_mode(trail_mode)
+    return scene
+
+def render_frames(scene, writer, first, last, fps, speed, show_trail):
+    # Every frame is a function of its index alone, so any range can be
+    # rendered independently; the trail layer rebuilds on the first one
+    playback = PlaybackClock(scene.timeline)
+    step_ns = export_step_ns(fps, speed)
+    scene.trail_layer.invalidate()
+    scene.compositor.invalidate()
+    for i in range(first, last):
+        playback.seek(scene.timeline.start_ns + i * step_ns)
+        scene.draw(playback.time_ns, playback.progress, show_trail)
+        writer.write(pygame.image.tobytes(scene.screen, "RGB"))
+
+# Worker process state for parallel export: the store is memory-mapped from
+# the input .ntrk file or the parent's temporary copy, the trail pyramid and
+# kinematics from the parent's saved copies, and the scene is built once per
+# process
+export_scene = None
+
+def init_export_worker(store_path, derived_path, trail_mode):
+    global export_scene
+    if store_path.endswith(TRAJECTORY_FILE_EXTENSION):
+        store = open_trajectory_file(store_path)
+    else:
+        store = TrajectoryStore.load(store_path)
+    pyramid = TrailPyramid.load(derived_path, store, WINDOW_WIDTH, WINDOW_HEIGHT)
+    export_scene = open_export_scene(store, trail_mode, pyramid, Kinematics.load(derived_path))
+
+def export_chunk(output, first, last, fps, speed, show_trail, workers):
+    writer = open_frame_writer(output, WINDOW_WIDTH, WINDOW_HEIGHT, fps, workers, start_index=first)
+    try:
+        render_frames(export_scene, writer, first, last, fps, speed, show_trail)
+    finally:
+        writer.close()
+    return writer.count
+
+def export_replay(store, output, fps=EXPORT_FPS, speed=DEFAULT_SPEED, show_trail=True, workers=4, processes=1, trail_mode=TRAIL_MODES[0], store_path=None, pyramid=None, kinematics=None):
+    # Streams every frame to disk; frames are never kept in memory. With
+    # processes > 1 the timeline is split into chunks rendered in parallel;
+    # store_path names the .ntrk file the store was opened from, which the
+    # workers then map directly instead of a temporary copy of the store.
+    # The pyramid and kinematics are built once here (unless passed in) and
+    # mapped by every worker.
+    total = export_frame_count(Timeline(store), fps, speed)
+    start = time.perf_counter()
+
+    if processes <= 1:
+        scene = open_export_scene(store, trail_mode, pyramid, kinematics)
+        writer = open_frame_writer(output, WINDOW_WIDTH, WINDOW_HEIGHT, fps, workers)
+        try:
+            render_frames(scene, writer, 0, total, fps, speed, show_trail)
+        finally:
+            writer.close()
+            pygame.quit()
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            if store_path is None:
+                store_path = os.path.join(tmp, "store")
+                store.save(store_path)
+            derived_path = os.path.join(tmp, "derived")
+            (pyramid or TrailPyramid(store, WINDOW_WIDTH, WINDOW_HEIGHT)).save(derived_path)
+            if kinematics is None:
+                write_kinematics(store, derived_path)
+            else:
+                kinematics.save(derived_path)
+            bounds = np.linspace(0, total, processes * EXPORT_CHUNKS_PER_PROCESS + 1).astype(int)
+            ranges = [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+            video = is_video_output(output)
+            targets = [os.path.join(tmp, f"chunk_{c:04d}{os.path.splitext(output)[1]}") if video else output for c in range(len(ranges))]
+
+            with ProcessPoolExecutor(processes, initializer=init_export_worker, initargs=(store_path, derived_path, trail_mode)) as pool:
+                futures = [pool.submit(export_chunk, target, int(a), int(b), fps, speed, show_trail, max(1, workers // processes))
+                           for target, (a, b) in zip(targets, ranges)]
+                for future in futures:
+                    future.result()
+            if video:
+                concat_videos(targets, output)
+
+    elapsed = time.perf_counter() - start
+    print(f"Exported {total} frames to {output} in {elapsed:.1f}s ({total / elapsed:.1f} frames/s)")
+    return total
+
+def export_main(argv):
+    parser = argparse.ArgumentParser(description="Export a mission replay without a display.")
+    parser.add_argument("csv", help=f"CSV file, or a {TRAJECTORY_FILE_EXTENSION} trajectory file")
+    parser.add_argument("output", help="directory for a PNG sequence, or a video file name for ffmpeg")
+    parser.add_argument("--x", help="X (longitude) column, detected when omitted")
+    parser.add_argument("--y", help="Y (latitude) column, detected when omitted")
+    parser.add_argument("--time", help="time column, detected when omitted")
+    parser.add_argument("--crs", help="input CRS of the x/y columns, required unless they look like degrees")
+    parser.add_argument("--fps", type=int, default=EXPORT_FPS)
+    parser.add_argument("--speed", type=float, default=DEFAULT_SPEED, help="mission seconds per second of video")
+    parser.add_argument("--workers", type=int, default=4, help="encoder threads")
+    parser.add_argument("--processes", type=int, default=1, help="render processes, each handling a range of the timeline")
+    parser.add_argument("--no-trail", action="store_true")
+    parser.add_argument("--trail-colour", choices=TRAIL_MODES, default=TRAIL_MODES[0], help="colour trails by track, speed or time")
+    args = parser.parse_args(argv)
+
+    source, store_path = (args.csv, None, None, None, None), None
+    if args.csv.endswith(TRAJECTORY_FILE_EXTENSION):
+        store_path = args.csv
+    else:
+        x_col, y_col, t_col, _, crs = detect_columns(args.csv)
+        x_col, y_col, t_col = args.x or x_col, args.y or y_col, args.time or t_col
+        if not (x_col and y_col and t_col):
+            parser.error("could not detect the x/y/time columns; pass --x, --y and --time")
+        if not (args.crs or crs):
+            # Projected metres read as degrees would export a blank map, not an error
+            parser.error(f"{x_col}/{y_col} do not look like degrees; pass --crs")
+        source = (args.csv, x_col, y_col, t_col, args.crs or crs)
+    store, pyramid, kinematics = load_trajectory_store(*source)
+    export_replay(store, args.output, args.fps, args.speed, not args.no_trail, args.workers, args.processes, args.trail_colour,
+                  store_path, pyramid, kinematics)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        export_main(sys.argv[1:])
+    else:
+        main()
\ No newline at end of file
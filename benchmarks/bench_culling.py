@@ -0,0 +1,67 @@
+# Benchmark: rebuilding the trail layer zoomed in on 1M segments, with the
+# SegmentIndex culling off-screen chunks vs walking every segment
+#
+#   python benchmarks/bench_culling.py [--tracks 10] [--points 100001] [--zoom 3000]
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import numpy as np
+import pygame
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from naiad_render import SegmentIndex, TrailLayer, TrailPyramid, ViewTransform
+from naiad_tracks import TrajectoryStore
+
+# Constants
+WIDTH, HEIGHT = 1280, 720
+COLOR = (255, 0, 0)
+
+def random_walks(tracks, n, seed=0):
+    rng = np.random.default_rng(seed)
+    return TrajectoryStore.from_tracks([(t, 2 + np.cumsum(rng.normal(0, 0.0005, n)), 45 + np.cumsum(rng.normal(0, 0.0005, n)),
+                                         np.arange(n, dtype=np.int64)) for t in range(tracks)])
+
+def rebuild(store, counts, view, pyramid, cull):
+    # One full layer rebuild; without culling every chunk counts as visible
+    query = SegmentIndex.query
+    if not cull:
+        SegmentIndex.query = lambda self, bounds: np.ones(len(self.lon_min), dtype=bool)
+    try:
+        layer = TrailLayer((WIDTH, HEIGHT))
+        start = time.perf_counter()
+        layer.update(store, counts, [COLOR] * len(store), view, pyramid)
+        elapsed = time.perf_counter() - start
+    finally:
+        SegmentIndex.query = query
+    return elapsed, pygame.image.tobytes(layer.surface, "RGBA")
+
+# Main
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Culled vs unculled zoomed-in trail rebuilds")
+    parser.add_argument("--tracks", type=int, default=10)
+    parser.add_argument("--points", type=int, default=100_001)
+    parser.add_argument("--zoom", type=float, default=3000)
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((WIDTH, HEIGHT))
+    store = random_walks(args.tracks, args.points)
+    start = time.perf_counter()
+    pyramid = TrailPyramid(store, WIDTH, HEIGHT)
+    print(f"{store.total_samples - len(store)} segments, pyramid and index built in {time.perf_counter() - start:.2f}s")
+
+    # Zoomed in on a point early in track 0
+    view = ViewTransform(WIDTH, HEIGHT)
+    x, y = view.project(store.lon[5000], store.lat[5000])
+    view.zoom_to(args.zoom, (int(x), int(y)))
+
+    for label, counts in (("whole trail", [args.points] * args.tracks), ("first third", [args.points // 3] * args.tracks)):
+        culled, culled_image = rebuild(store, counts, view, pyramid, True)
+        unculled, unculled_image = rebuild(store, counts, view, pyramid, False)
+        print(f"zoom {args.zoom:g}, {label}: culled {culled * 1000:.1f} ms, unculled {unculled * 1000:.1f} ms "
+              f"({unculled / culled:.0f}x), identical={culled_image == unculled_image}")
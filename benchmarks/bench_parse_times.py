@@ -0,0 +1,57 @@
+# Benchmark: parsing 5M timestamps with naiad_io.parse_times vs plain
+# pd.to_datetime and pd.to_datetime(format="ISO8601"), for fixed ISO,
+# mixed ISO and epoch-millisecond string columns
+#
+#   python benchmarks/bench_parse_times.py [--rows 5000000]
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from naiad_io import infer_time_format, parse_times
+from naiad_tracks import to_epoch_ns
+
+# Constants
+START = np.datetime64("2025-01-01T00:00:00", "ns").astype(np.int64)
+DAY_NS = 86400 * 10 ** 9
+
+def make_cases(n, seed=0):
+    # (name, string values, expected int64 ns); times are whole microseconds
+    rng = np.random.default_rng(seed)
+    ns = START + np.sort(rng.integers(0, DAY_NS, n)) // 1000 * 1000
+    iso = pd.Series(pd.to_datetime(ns)).dt.strftime("%Y-%m-%dT%H:%M:%S.%f").to_numpy(dtype=object)
+    # Mixed ISO: every other row drops the fraction
+    mixed, mixed_ns = iso.copy(), ns.copy()
+    mixed[::2] = [value[:19] for value in mixed[::2]]
+    mixed_ns[::2] = ns[::2] // 10 ** 9 * 10 ** 9
+    epoch_ms = (ns // 10 ** 6).astype(str).astype(object)
+    return [("ISO fixed", iso, ns), ("ISO mixed", mixed, mixed_ns), ("epoch ms", epoch_ms, ns // 10 ** 6 * 10 ** 6)]
+
+# Main
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="parse_times vs pd.to_datetime")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    for name, values, expected in make_cases(args.rows):
+        results = []
+        for label, kwargs in (("pd.to_datetime", {}), ("ISO8601", {"format": "ISO8601"})):
+            start = time.perf_counter()
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", UserWarning)
+                    parsed = to_epoch_ns(pd.to_datetime(pd.Series(values), **kwargs))
+                results.append(f"{label} {time.perf_counter() - start:5.2f}s correct={np.array_equal(parsed, expected)}")
+            except (ValueError, TypeError) as e:
+                results.append(f"{label} fails ({type(e).__name__})")
+        start = time.perf_counter()
+        parsed = parse_times(values)
+        results.append(f"parse_times {time.perf_counter() - start:5.2f}s correct={np.array_equal(parsed, expected)}")
+        print(f"{name:>9} x {args.rows}: " + " | ".join(results) + f"  format={infer_time_format(values)}", flush=True)
@@ -0,0 +1,52 @@
+# Benchmark: row-wise vs column-wise reprojection (naiad_io.reproject_to_wgs84)
+#
+#   python benchmarks/bench_reproject.py [--rows 10000 1000000 10000000] [--crs EPSG:32631]
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from pyproj import Transformer, CRS
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from naiad_io import TARGET_CRS, reproject_to_wgs84
+
+# Constants
+ROWS = (10_000, 1_000_000, 10_000_000)
+SOURCE_CRS = "EPSG:32631"  # UTM 31N, so every row needs a real transform
+
+# Reference
+
+def reproject_rowwise(df, x_col, y_col, projection_input):
+    # The original load_and_process_csv: one transformer call per row
+    transformer = Transformer.from_crs(CRS(projection_input), TARGET_CRS, always_xy=True)
+    df['lon'], df['lat'] = zip(*df.apply(lambda row: transformer.transform(row[x_col], row[y_col]), axis=1))
+    return df
+
+def make_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"x": rng.uniform(400_000, 600_000, n), "y": rng.uniform(4.8e6, 5.2e6, n)})
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+# Main
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Row-wise vs column-wise reprojection timings")
+    parser.add_argument("--rows", type=int, nargs="+", default=ROWS)
+    parser.add_argument("--crs", default=SOURCE_CRS)
+    args = parser.parse_args()
+
+    for n in args.rows:
+        rowwise_s, rowwise = timed(reproject_rowwise, make_frame(n), "x", "y", args.crs)
+        bulk_s, bulk = timed(reproject_to_wgs84, make_frame(n), "x", "y", args.crs)
+        same = np.array_equal(rowwise["lon"], bulk["lon"]) and np.array_equal(rowwise["lat"], bulk["lat"])
+        skip_s, _ = timed(reproject_to_wgs84, bulk, "lon", "lat", "EPSG:4326")
+        print(f"{n:>10} rows: row-wise {rowwise_s:8.3f}s  column-wise {bulk_s:7.3f}s  "
+              f"({rowwise_s / bulk_s:6.0f}x)  identical={same}  EPSG:4326 pass-through {skip_s:.3f}s", flush=True)
@@ -0,0 +1,77 @@
+# Benchmark: seek plus draw while scrubbing a 10M-sample mission, after a
+# full play-through, at the zoom levels the viewer offers
+#
+#   python benchmarks/bench_seek.py [--tracks 100] [--samples 100000] [--seeks 200]
+
+import argparse
+import gc
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import numpy as np
+import pygame
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import animation_point_v7_multipoint_speed_track as viewer
+from naiad_render import HudText
+from naiad_tracks import PlaybackClock, TrajectoryStore
+
+# Constants
+FRAME_MS = 1000 / 60
+PLAY_FRAMES = 600
+# The whole world, the missions filling the window, and a close-up at full resolution
+ZOOMS = (1.0, 60.0, 600.0)
+START = (10.0, 45.0)  # lon, lat every walk leaves from; zooms are anchored there
+STEP_DEG = 1e-4
+
+def random_walks(tracks, samples, seed=0):
+    # Drones leaving a shared start about 10 m per fix, slowly turning; one
+    # fix per second, each mission spreading over a degree or two
+    rng = np.random.default_rng(seed)
+    walks = []
+    for t in range(tracks):
+        heading = np.cumsum(rng.normal(0, 0.05, samples))
+        walks.append((t, START[0] + np.cumsum(STEP_DEG * np.cos(heading)), START[1] + np.cumsum(STEP_DEG * np.sin(heading)),
+                      np.arange(samples, dtype=np.int64) * 10 ** 9))
+    return TrajectoryStore.from_tracks(walks)
+
+def seek_times(scene, targets):
+    # Milliseconds per seek, each drawn like a scrubbing frame
+    playback = PlaybackClock(scene.timeline)
+    for t_ns in np.linspace(scene.timeline.start_ns, scene.timeline.end_ns, PLAY_FRAMES):
+        playback.seek(int(t_ns))
+        scene.draw(playback.time_ns, playback.progress, True)
+    times = []
+    for t_ns in targets:
+        start = time.perf_counter()
+        playback.seek(int(t_ns))
+        scene.draw(playback.time_ns, playback.progress, True)
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+# Main
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seek plus draw times after a full play-through")
+    parser.add_argument("--tracks", type=int, default=100)
+    parser.add_argument("--samples", type=int, default=100_000, help="samples per track")
+    parser.add_argument("--seeks", type=int, default=200)
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode((viewer.WINDOW_WIDTH, viewer.WINDOW_HEIGHT))
+    store = random_walks(args.tracks, args.samples)
+    scene = viewer.Scene(screen, store, HudText(pygame.font.SysFont(None, 24)), None)
+    targets = np.random.default_rng(1).uniform(scene.timeline.start_ns, scene.timeline.end_ns, args.seeks)
+    gc.freeze()  # As the viewer does once a store is loaded
+
+    for zoom in ZOOMS:
+        x, y = scene.view.project([START[0]], [START[1]])
+        scene.view.zoom_to(zoom, (int(x[0]), int(y[0])))
+        level = scene.pyramid.level_for(zoom)
+        ms = seek_times(scene, targets)
+        print(f"zoom {zoom:g} ({level.store.total_samples} level samples): median {np.median(ms):.1f} ms, "
+              f"p95 {np.percentile(ms, 95):.1f} ms, max {ms.max():.1f} ms, "
+              f"{(ms > FRAME_MS).sum()} of {len(ms)} seeks over one frame")
@@ -0,0 +1,74 @@
+# Benchmark: per-frame trail cost over a 100k-point replay, redrawing every
+# segment each frame (the original loop) vs the incremental TrailLayer
+#
+#   python benchmarks/bench_trail_layer.py [--points 100000] [--frames 500]
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import numpy as np
+import pygame
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from naiad_render import TrailLayer, ViewTransform
+from naiad_tracks import TrajectoryStore
+
+# Constants
+WIDTH, HEIGHT = 1280, 720
+COLOR = (255, 0, 0)
+
+# Reference
+
+def latlon_to_screen(lat, lon):
+    x = (lon + 180) * (WIDTH / 360)
+    y = (90 - lat) * (HEIGHT / 180)
+    return int(x), int(y)
+
+def draw_full_trail(screen, lon, lat, k):
+    # The original loop: every segment up to the current sample, every frame
+    for i in range(1, k):
+        x1, y1 = latlon_to_screen(lat[i-1], lon[i-1])
+        x2, y2 = latlon_to_screen(lat[i], lon[i])
+        pygame.draw.line(screen, COLOR, (x1, y1), (x2, y2), 2)
+
+def random_walk(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return TrajectoryStore.from_tracks([(0, np.cumsum(rng.normal(0, 0.05, n)), np.cumsum(rng.normal(0, 0.05, n)),
+                                         np.arange(n, dtype=np.int64))])
+
+# Main
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-redraw vs incremental trail frame times")
+    parser.add_argument("--points", type=int, default=100_000)
+    parser.add_argument("--frames", type=int, default=500)
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    store = random_walk(args.points)
+    lon, lat, _ = store.track(0)
+    view = ViewTransform(WIDTH, HEIGHT)
+    layer = TrailLayer((WIDTH, HEIGHT))
+
+    counts = np.linspace(1, args.points, args.frames).astype(int)
+    incremental = []
+    for k in counts:
+        start = time.perf_counter()
+        layer.update(store, [int(k)], [COLOR], view)
+        screen.blit(layer.surface, (0, 0))
+        incremental.append(time.perf_counter() - start)
+    incremental = np.array(incremental) * 1000
+    tenth = max(1, args.frames // 10)
+    print(f"incremental: first 10% {incremental[:tenth].mean():.2f} ms/frame, "
+          f"last 10% {incremental[-tenth:].mean():.2f} ms/frame, max {incremental.max():.2f} ms "
+          f"({args.frames} frames, {args.points} points)")
+
+    # The full redraw is measured at a few points of the replay; its cost grows with k
+    for k in (args.points // 10, args.points // 2, args.points):
+        start = time.perf_counter()
+        draw_full_trail(screen, lon, lat, k)
+        print(f"full redraw at sample {k}: {(time.perf_counter() - start) * 1000:.1f} ms/frame")
@@ -0,0 +1,91 @@
+# Benchmark: draw calls and ms/frame for trails of 1, 10 and 100 tracks,
+# one pygame.draw.line per segment (the original loop) vs the TrailLayer's
+# one pygame.draw.lines polyline per track
+#
+#   python benchmarks/bench_trail_lines.py [--tracks 1 10 100] [--points 5000]
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import numpy as np
+import pygame
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from naiad_render import TrailLayer, ViewTransform
+from naiad_tracks import TrajectoryStore
+
+# Constants
+WIDTH, HEIGHT = 1280, 720
+COLOR = (255, 0, 0)
+FRAMES = 20
+
+# Draw call counting
+
+class CallCounter:
+    # Wraps a pygame.draw function and counts its calls
+    def __init__(self, name):
+        self.name = name
+        self.original = getattr(pygame.draw, name)
+        self.calls = 0
+        setattr(pygame.draw, name, self)
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.original(*args, **kwargs)
+
+# Reference
+
+def draw_per_segment(screen, store, view):
+    # Every segment of every track as its own pygame.draw.line call
+    xs, ys = view.project(store.lon, store.lat)
+    for t in range(len(store)):
+        s = store.track_slice(t)
+        points = np.column_stack((xs[s], ys[s])).tolist()
+        for p1, p2 in zip(points, points[1:]):
+            pygame.draw.line(screen, COLOR, p1, p2, 2)
+
+def random_walks(tracks, n, seed=0):
+    rng = np.random.default_rng(seed)
+    return TrajectoryStore.from_tracks([(t, np.cumsum(rng.normal(0, 0.05, n)), np.cumsum(rng.normal(0, 0.05, n)),
+                                         np.arange(n, dtype=np.int64)) for t in range(tracks)])
+
+# Main
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-segment vs polyline trail drawing")
+    parser.add_argument("--tracks", type=int, nargs="+", default=(1, 10, 100))
+    parser.add_argument("--points", type=int, default=5000)
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    line_calls = CallCounter("line")
+    lines_calls = CallCounter("lines")
+
+    for tracks in args.tracks:
+        store = random_walks(tracks, args.points)
+        colors = [COLOR] * tracks
+        view = ViewTransform(WIDTH, HEIGHT)
+
+        # Worst case for the layer: a pan every frame forces a full rebuild
+        layer = TrailLayer((WIDTH, HEIGHT))
+        polyline = []
+        for _ in range(FRAMES):
+            view.pan_by(1, 0)
+            lines_calls.calls = 0
+            start = time.perf_counter()
+            layer.update(store, [args.points] * tracks, colors, view)
+            screen.blit(layer.surface, (0, 0))
+            polyline.append(time.perf_counter() - start)
+        polyline_calls = lines_calls.calls
+
+        line_calls.calls = 0
+        start = time.perf_counter()
+        draw_per_segment(screen, store, view)
+        per_segment = time.perf_counter() - start
+
+        print(f"{tracks:>3} tracks x {args.points} points: per-segment {line_calls.calls} calls {per_segment * 1000:.1f} ms/frame, "
+              f"polyline {polyline_calls} calls {np.median(polyline) * 1000:.1f} ms/frame (full rebuild)")
@@ -0,0 +1,133 @@
+# Frame sinks for headless replay export
+
+import abc
+import os
+import queue
+import struct
+import subprocess
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+
+# Constants
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".avi", ".webm")
+PNG_COMPRESSION = 3
+
+# PNG encoding
+
+def encode_png(rgb, width, height, level=PNG_COMPRESSION):
+    # Minimal RGB PNG writer; zlib releases the GIL, so worker threads
+    # encode in parallel with the render loop
+    rows = np.frombuffer(rgb, dtype=np.uint8).reshape(height, width * 3)
+    raw = np.hstack((np.zeros((height, 1), dtype=np.uint8), rows)).tobytes()
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, level)) + chunk(b"IEND", b"")
+
+# Frame writers
+
+class FrameWriter(abc.ABC):
+    # Frames are handed over as raw RGB bytes through a bounded queue, so
+    # rendering blocks only when the encoders fall behind and memory never
+    # holds more than queue_size frames. Subclasses implement encode(),
+    # which runs on the worker threads.
+
+    def __init__(self, workers, queue_size, start_index=0):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.start_index = start_index
+        self.count = 0
+        self.error = None
+        self.threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def write(self, rgb):
+        if self.error:
+            raise self.error
+        self.queue.put((self.start_index + self.count, rgb))
+        self.count += 1
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error:
+                continue
+            try:
+                self.encode(*item)
+            except Exception as e:
+                self.error = e
+
+    @abc.abstractmethod
+    def encode(self, index, rgb):
+        pass
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.error:
+            raise self.error
+
+class PngSequenceWriter(FrameWriter):
+    def __init__(self, directory, width, height, workers=4, queue_size=32, start_index=0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.width = width
+        self.height = height
+        super().__init__(workers, queue_size, start_index)
+
+    def encode(self, index, rgb):
+        path = os.path.join(self.directory, f"frame_{index:06d}.png")
+        with open(path, "wb") as f:
+            f.write(encode_png(rgb, self.width, self.height))
+
+class FfmpegWriter(FrameWriter):
+    # Streams raw frames into an ffmpeg process; a single writer thread
+    # keeps frame order while ffmpeg encodes on its own cores
+    def __init__(self, path, width, height, fps, queue_size=32):
+        self.process = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error", "-y",
+             "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+             "-pix_fmt", "yuv420p", path],
+            stdin=subprocess.PIPE)
+        super().__init__(1, queue_size)
+
+    def encode(self, index, rgb):
+        self.process.stdin.write(rgb)
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.process.stdin.close()
+            if self.process.wait() != 0 and not self.error:
+                raise RuntimeError(f"ffmpeg exited with status {self.process.returncode}")
+
+def is_video_output(output):
+    return output.lower().endswith(VIDEO_EXTENSIONS)
+
+def open_frame_writer(output, width, height, fps, workers=4, start_index=0):
+    # A video file name goes through ffmpeg; anything else is a PNG directory.
+    # start_index numbers PNG frames when several processes share a directory.
+    if is_video_output(output):
+        return FfmpegWriter(output, width, height, fps)
+    return PngSequenceWriter(output, width, height, workers, start_index=start_index)
+
+def concat_videos(parts, output):
+    # Joins same-codec segments in order without re-encoding
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as listing:
+        for part in parts:
+            listing.write(f"file '{os.path.abspath(part)}'\n")
+    try:
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0",
+                        "-i", listing.name, "-c", "copy", output], check=True)
+    finally:
+        os.remove(listing.name)
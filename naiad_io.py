@@ -0,0 +1,442 @@
+# Loading helpers shared by the animation scripts
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import struct
+import warnings
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+from pyproj import Transformer, CRS
+
+from naiad_tracks import TrackBuilder, TrajectoryStore, to_epoch_ns
+
+# Constants
+TARGET_CRS = CRS("EPSG:4326")
+REPROJECT_CHUNK_SIZE = 1_000_000
+CSV_CHUNK_ROWS = 250000
+TIME_SAMPLE_ROWS = 1000
+DETECT_SAMPLE_ROWS = 200
+# Header names recognised by column detection, most specific first
+X_COLUMN_NAMES = ("longitude", "lon", "long", "lng", "x", "easting")
+Y_COLUMN_NAMES = ("latitude", "lat", "y", "northing")
+TIME_COLUMN_NAMES = ("timestamp", "time", "datetime", "date_time", "utc", "t")
+# Smallest magnitude of a numeric epoch column in each unit (2001-09-09 in seconds)
+EPOCH_UNITS = ((1e17, "ns"), (1e14, "us"), (1e11, "ms"), (0, "s"))
+CACHE_DIR_ENV = "NAIAD_CACHE_DIR"  # Overrides the per-user cache location
+CACHE_DIR_NAME = "naiad_vis"
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+CACHE_VERSION = 2
+CACHE_SAMPLE_BYTES = 1 << 20
+TRAJECTORY_FILE_EXTENSION = ".ntrk"
+TRAJECTORY_MAGIC = b"NAIADTRK"
+TRAJECTORY_VERSION = 1
+# magic, version, coordinate item size, track count, sample count, then the
+# byte offset of the ids (plus their length), offset table, lon, lat and time
+TRAJECTORY_HEADER = struct.Struct("<8sIIQQQQQQQQ")
+TRAJECTORY_HEADER_SIZE = 128
+TRAJECTORY_ALIGN = 64
+
+# Reprojection
+
+def reproject_columns(x, y, projection_input, chunk_size=REPROJECT_CHUNK_SIZE):
+    # Returns new float64 lon/lat arrays; the inputs are never modified
+    lon = np.array(x, dtype=np.float64)
+    lat = np.array(y, dtype=np.float64)
+
+    source_crs = CRS(projection_input)
+    if source_crs == TARGET_CRS:
+        return lon, lat
+
+    # Transform whole column slices in place, one chunk at a time, so the
+    # temporary buffers pyproj needs stay bounded on very large files
+    transformer = Transformer.from_crs(source_crs, TARGET_CRS, always_xy=True)
+    for start in range(0, len(lon), chunk_size):
+        stop = start + chunk_size
+        transformer.transform(lon[start:stop], lat[start:stop], inplace=True)
+    return lon, lat
+
+def reproject_to_wgs84(df, x_col, y_col, projection_input, chunk_size=REPROJECT_CHUNK_SIZE):
+    lon, lat = reproject_columns(df[x_col].to_numpy(), df[y_col].to_numpy(), projection_input, chunk_size)
+    df['lon'] = lon
+    df['lat'] = lat
+    return df
+
+# Time parsing
+
+def infer_time_format(values, sample_rows=TIME_SAMPLE_ROWS):
+    # Decides once, from the first sample_rows non-null values, how a time
+    # column is parsed: ("epoch", unit) for numeric epochs, otherwise
+    # ("formats", {string length: format}). Mixed ISO logs (with and without
+    # fractions or offsets) get one fixed format per length, which pandas
+    # parses several times faster than format="ISO8601".
+    sample = pd.Series(values[:sample_rows]).dropna().astype(str)
+    if sample.empty:
+        return ("formats", {})
+
+    numbers = pd.to_numeric(sample, errors="coerce")
+    if numbers.notna().all():
+        magnitude = numbers.abs().max()
+        return ("epoch", next(unit for threshold, unit in EPOCH_UNITS if magnitude >= threshold))
+
+    # One day/month order for the whole column: month-first unless the
+    # sample only reads consistently day-first (13/2/2025 next to 1/3/2025)
+    for dayfirst in (False, True):
+        formats = guess_formats(sample, dayfirst)
+        if formats is not None:
+            return ("formats", formats)
+    return ("formats", {})  # No consistent guess: every row is parsed as "mixed"
+
+def is_dayfirst(fmt):
+    return "%d" in fmt and "%m" in fmt and fmt.index("%d") < fmt.index("%m")
+
+def guess_formats(sample, dayfirst):
+    # {string length: format} for one day/month order, or None when a length
+    # group does not parse with its guess or the guesses disagree on the order
+    formats = {}
+    for length, group in sample.groupby(sample.str.len()):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # pandas warns on day-first guesses
+            fmt = guess_datetime_format(group.iloc[0], dayfirst=dayfirst)
+        for candidate in ((fmt, "ISO8601") if fmt else ("ISO8601",)):
+            try:
+                pd.to_datetime(group, format=candidate, utc=True)
+                formats[int(length)] = candidate
+                break
+            except (ValueError, TypeError):
+                continue
+        else:
+            return None
+    if len({is_dayfirst(fmt) for fmt in formats.values() if "%d" in fmt and "%m" in fmt}) > 1:
+        return None
+    return formats
+
+def to_datetime_utc(series, fmt, dayfirst=False):
+    # A format that stops matching partway through falls back to
+    # per-element parsing (in the column's day/month order) rather than
+    # failing the load
+    try:
+        return pd.to_datetime(series, format=fmt, dayfirst=dayfirst, utc=True)
+    except (ValueError, TypeError):
+        return pd.to_datetime(series, format="mixed", dayfirst=dayfirst, utc=True)
+
+def epoch_numbers(values):
+    # Whole-number strings convert straight to int64; strings with a
+    # fraction and object columns of numbers go through to_numeric
+    if pd.api.types.infer_dtype(values, skipna=True) == "string":
+        try:
+            return values.astype(np.int64)
+        except (ValueError, OverflowError):
+            pass
+    return pd.to_numeric(values)
+
+def parse_times(values, time_format=None):
+    # Returns int64 nanoseconds since the epoch (UTC; naive times are taken as UTC)
+    kind, spec = time_format or infer_time_format(values)
+    values = np.asarray(values)
+    if kind == "epoch":
+        scale = {"s": 10 ** 9, "ms": 10 ** 6, "us": 10 ** 3, "ns": 1}[spec]
+        if values.dtype.kind not in ("i", "u", "f"):
+            values = epoch_numbers(values)
+        if values.dtype.kind in ("i", "u"):
+            return values.astype(np.int64) * scale
+        # Whole and fractional parts are scaled apart so sub-unit fixes keep
+        # their precision instead of being truncated or lost to float rounding
+        whole = np.floor(values)
+        return whole.astype(np.int64) * scale + np.round((values - whole) * scale).astype(np.int64)
+
+    series = pd.Series(values)
+    dayfirst = any(is_dayfirst(fmt) for fmt in spec.values())
+    if len(spec) == 1:
+        return to_epoch_ns(to_datetime_utc(series, next(iter(spec.values())), dayfirst))
+    time_ns = np.empty(len(series), dtype=np.int64)
+    lengths = series.str.len().to_numpy()
+    remaining = np.ones(len(series), dtype=bool)
+    for length, fmt in spec.items():
+        rows = lengths == length
+        if rows.any():
+            time_ns[rows] = to_epoch_ns(to_datetime_utc(series[rows], fmt, dayfirst))
+            remaining &= ~rows
+    if remaining.any():
+        # Lengths the sample never showed
+        time_ns[remaining] = to_epoch_ns(to_datetime_utc(series[remaining], "mixed", dayfirst))
+    return time_ns
+
+# Processing
+
+def find_id_column(columns):
+    # The first column with "id" in its name identifies the track
+    for col in columns:
+        if "id" in col.lower():
+            return col
+    return None
+
+def clean_track_ids(values):
+    # A blank id makes read_csv load the column as float64; once those rows
+    # are dropped, whole-number ids go back to int64 so tracks keep their labels
+    if values.dtype.kind == "f" and np.array_equal(values, np.trunc(values)):
+        return values.astype(np.int64)
+    return values
+
+# Column detection
+
+def match_column(columns, names):
+    for name in names:
+        for col in columns:
+            if col.strip().lower() == name:
+                return col
+    return None
+
+def detect_time_column(sample):
+    # Tries the columns named like a time first, then the rest, parsing only
+    # the sample; bare numbers count as times only under a time-like name
+    named = match_column(sample.columns, TIME_COLUMN_NAMES)
+    candidates = ([named] if named else []) + [col for col in sample.columns if col != named]
+    for col in candidates:
+        values = sample[col].dropna()
+        if values.empty or (col != named and values.dtype.kind in "iufb"):
+            continue
+        try:
+            parse_times(values.to_numpy())
+            return col
+        except (ValueError, TypeError, OverflowError):
+            continue
+    return None
+
+def detect_columns(file_path, sample_rows=DETECT_SAMPLE_ROWS):
+    # Picks x/y/time/id columns from the header and the first sample_rows
+    # rows, so the cost does not grow with the file. The CRS is reported as
+    # EPSG:4326 when the sampled x/y look like degrees, otherwise None.
+    sample = pd.read_csv(file_path, nrows=sample_rows)
+    x_col = match_column(sample.columns, X_COLUMN_NAMES)
+    y_col = match_column(sample.columns, Y_COLUMN_NAMES)
+    t_col = detect_time_column(sample)
+    id_col = find_id_column(sample.columns)
+
+    crs = None
+    if x_col and y_col:
+        x = pd.to_numeric(sample[x_col], errors="coerce").dropna()
+        y = pd.to_numeric(sample[y_col], errors="coerce").dropna()
+        if len(x) and len(y) and x.abs().max() <= 180 and y.abs().max() <= 90:
+            crs = "EPSG:4326"
+    return x_col, y_col, t_col, id_col, crs
+
+def stream_csv(file_path, x_col, y_col, t_col, projection_input="EPSG:4326", interpolate=False, chunk_size=CSV_CHUNK_ROWS, progress=None):
+    # Builds a TrajectoryStore without ever holding the whole file as a
+    # DataFrame: only the needed columns are read, chunk_size rows at a
+    # time, and each cleaned, reprojected chunk is appended per track.
+    # progress(fraction, builder) is called after every chunk, with the
+    # fraction of the file read so far.
+    id_col = find_id_column(pd.read_csv(file_path, nrows=0).columns)
+    usecols = [x_col, y_col, t_col] + ([id_col] if id_col and id_col not in (x_col, y_col, t_col) else [])
+
+    # The time format is inferred once from the head of the file; numeric
+    # epoch columns are left to read_csv's native number parser
+    head = pd.read_csv(file_path, usecols=[t_col], dtype={t_col: str}, nrows=TIME_SAMPLE_ROWS)
+    time_format = infer_time_format(head[t_col].dropna().to_numpy())
+    dtypes = {x_col: np.float64, y_col: np.float64}
+    if time_format[0] != "epoch":
+        dtypes[t_col] = str
+
+    builder = TrackBuilder()
+    size = max(os.path.getsize(file_path), 1)
+    with open(file_path, "rb") as f:
+        for chunk in pd.read_csv(f, usecols=usecols, dtype=dtypes, chunksize=chunk_size):
+            chunk = chunk.dropna(subset=usecols)  # Rows without a track id are dropped too
+            if not chunk.empty:
+                time_ns = parse_times(chunk[t_col].to_numpy(), time_format)
+                lon, lat = reproject_columns(chunk[x_col].to_numpy(), chunk[y_col].to_numpy(), projection_input)
+                track_ids = clean_track_ids(chunk[id_col].to_numpy()) if id_col else np.zeros(len(chunk), dtype=np.int64)
+                builder.append(track_ids, lon, lat, time_ns)
+            if progress:
+                progress(min(f.tell() / size, 1.0), builder)
+    return builder.build(interpolate)
+
+# Trajectory files
+
+def write_trajectory_file(store, path, coord_dtype=np.float64):
+    # Fixed header, JSON track ids, the int64 offset table, then one
+    # contiguous column each for lon, lat (float32 or float64) and time_ns.
+    # Sections start on TRAJECTORY_ALIGN boundaries so every column maps
+    # cleanly with np.memmap.
+    coord_dtype = np.dtype(coord_dtype)
+    if coord_dtype not in (np.float32, np.float64):
+        raise ValueError(f"Unsupported coordinate dtype: {coord_dtype}")
+    ids = json.dumps([track_id.item() if isinstance(track_id, np.generic) else track_id
+                      for track_id in store.track_ids]).encode()
+    n = store.total_samples
+
+    def align(position):
+        return -(-position // TRAJECTORY_ALIGN) * TRAJECTORY_ALIGN
+
+    ids_at = TRAJECTORY_HEADER_SIZE
+    offsets_at = align(ids_at + len(ids))
+    lon_at = align(offsets_at + store.offsets.nbytes)
+    lat_at = align(lon_at + n * coord_dtype.itemsize)
+    time_at = align(lat_at + n * coord_dtype.itemsize)
+    header = TRAJECTORY_HEADER.pack(TRAJECTORY_MAGIC, TRAJECTORY_VERSION, coord_dtype.itemsize, len(store), n,
+                                    ids_at, len(ids), offsets_at, lon_at, lat_at, time_at)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        for position, data in ((ids_at, ids), (offsets_at, store.offsets.astype("<i8")),
+                               (lon_at, store.lon), (lat_at, store.lat), (time_at, store.time_ns)):
+            f.seek(position)
+            if isinstance(data, np.ndarray):
+                # Converted a block at a time so memory-mapped stores stream through
+                dtype = data.dtype if data.dtype.kind == "i" else coord_dtype
+                for start in range(0, len(data), REPROJECT_CHUNK_SIZE):
+                    f.write(np.asarray(data[start:start + REPROJECT_CHUNK_SIZE], dtype=dtype.newbyteorder("<")).tobytes())
+            else:
+                f.write(data)
+    os.replace(tmp_path, path)
+
+def open_trajectory_file(path):
+    # Columns stay on disk as read-only memory maps; only the pages of the
+    # tracks and time window actually touched are read in
+    with open(path, "rb") as f:
+        raw = f.read(TRAJECTORY_HEADER_SIZE)
+        if len(raw) < TRAJECTORY_HEADER.size:
+            raise ValueError(f"{path}: truncated trajectory file")
+        magic, version, coord_size, n_tracks, n, ids_at, ids_size, offsets_at, lon_at, lat_at, time_at = TRAJECTORY_HEADER.unpack_from(raw)
+        if magic != TRAJECTORY_MAGIC:
+            raise ValueError(f"{path}: not a NAIAD trajectory file")
+        if version != TRAJECTORY_VERSION:
+            raise ValueError(f"{path}: unsupported trajectory file version {version}")
+        f.seek(ids_at)
+        track_ids = json.loads(f.read(ids_size))
+
+    coord_dtype = np.dtype("<f4" if coord_size == 4 else "<f8")
+
+    def column(dtype, offset, count):
+        if count == 0:
+            return np.empty(0, dtype=dtype)  # np.memmap refuses empty maps
+        return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+
+    offsets = column("<i8", offsets_at, n_tracks + 1)
+    return TrajectoryStore(track_ids, offsets, column(coord_dtype, lon_at, n), column(coord_dtype, lat_at, n),
+                           column("<i8", time_at, n))
+
+def convert_csv(file_path, output, x_col, y_col, t_col, projection_input="EPSG:4326", coord_dtype=np.float64, interpolate=False):
+    store = stream_csv(file_path, x_col, y_col, t_col, projection_input, interpolate)
+    write_trajectory_file(store, output, coord_dtype)
+    return store
+
+# Processed trajectory cache
+
+def default_cache_dir():
+    # $NAIAD_CACHE_DIR, else naiad_vis under the user's cache directory
+    # (%LOCALAPPDATA% on Windows, $XDG_CACHE_HOME or ~/.cache elsewhere)
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, CACHE_DIR_NAME)
+
+class TrajectoryCache:
+    # Work derived from a source file (its processed store, trail pyramid,
+    # kinematics) kept as a directory of .npy files, keyed on the file and
+    # the options used to process it, so later opens memory-map it. An
+    # entry's mtime marks its last use; the least recently used entries are
+    # evicted beyond max_bytes.
+
+    def __init__(self, directory=None, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def key(self, file_path, *options):
+        # Size, mtime and the first and last CACHE_SAMPLE_BYTES of content
+        # stand in for a full hash, which would cost seconds on large logs
+        stat = os.stat(file_path)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((CACHE_VERSION, stat.st_size, stat.st_mtime_ns, options)).encode())
+        with open(file_path, "rb") as f:
+            digest.update(f.read(CACHE_SAMPLE_BYTES))
+            if stat.st_size > CACHE_SAMPLE_BYTES:
+                f.seek(max(CACHE_SAMPLE_BYTES, stat.st_size - CACHE_SAMPLE_BYTES))
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key, load):
+        # load(directory) reads the entry; None when there is none
+        path = self.path(key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            value = load(path)
+        except (OSError, KeyError, ValueError, EOFError):
+            # A damaged entry would fail every later open too, so it is dropped
+            remove_entry(path)
+            return None
+        os.utime(path)
+        return value
+
+    def put(self, key, save):
+        # save(directory) writes the entry into a temporary directory that
+        # only replaces the entry once complete
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        tmp_path = path + ".tmp"
+        remove_entry(tmp_path)
+        try:
+            save(tmp_path)
+            remove_entry(path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            # A full disk must not leave a partial entry behind
+            remove_entry(tmp_path)
+            raise
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        # The entry just written is kept even when it alone exceeds max_bytes
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if path != keep:
+                entries.append((os.stat(path).st_mtime, entry_size(path), path))
+        total = sum(size for _, size, _ in entries) + (entry_size(keep) if keep else 0)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            remove_entry(path)
+            total -= size
+
+def entry_size(path):
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return os.path.getsize(path)
+
+def remove_entry(path):
+    # Best effort: an entry another process still has open may stay behind
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+# Converter
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Convert a trajectory CSV to a memory-mappable {TRAJECTORY_FILE_EXTENSION} file")
+    parser.add_argument("csv")
+    parser.add_argument("output")
+    parser.add_argument("--x", required=True, help="X (longitude) column")
+    parser.add_argument("--y", required=True, help="Y (latitude) column")
+    parser.add_argument("--time", required=True, help="time column")
+    parser.add_argument("--crs", default="EPSG:4326", help="input CRS of the X/Y columns")
+    parser.add_argument("--float32", action="store_true", help="store lon/lat as float32 (about 1 m precision, half the size)")
+    parser.add_argument("--interpolate", action="store_true", help="pre-expand tracks with interpolate_track")
+    args = parser.parse_args()
+    store = convert_csv(args.csv, args.output, args.x, args.y, args.time, args.crs,
+                        np.float32 if args.float32 else np.float64, args.interpolate)
+    print(f"Wrote {len(store)} tracks, {store.total_samples} samples to {args.output}")
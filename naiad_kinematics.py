@@ -0,0 +1,121 @@
+# Per-sample kinematics computed once at load time for every track
+
+import os
+
+import numpy as np
+
+# Constants
+EARTH_RADIUS_M = 6_371_008.8  # Mean Earth radius
+KINEMATICS_COLUMNS = ("distance_m", "speed_mps", "heading_deg", "accel_mps2")
+KINEMATICS_BLOCK = 1 << 20  # Samples per pass, bounding temporaries on memory-mapped stores
+
+# Great-circle helpers
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    # Distance in metres between lon/lat degree arrays
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lon1, lat1, lon2, lat2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+def bearing_deg(lon1, lat1, lon2, lat2):
+    # Initial bearing from point 1 to point 2, 0..360 degrees clockwise from north
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lon1, lat1, lon2, lat2))
+    dlon = lon2 - lon1
+    x = np.sin(dlon) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return np.degrees(np.arctan2(x, y)) % 360
+
+# Kinematics columns
+
+class Kinematics:
+    # float32 columns aligned with a store's samples. Sample j describes the
+    # segment leaving it (j -> j + 1); a track's last sample repeats the
+    # segment before it, so the value at a track's current segment is
+    # column[offsets[t] + max(k - 1, 0)] for k samples passed.
+    #   distance_m   segment length (0 for a track's last sample)
+    #   speed_mps    ground speed over the segment
+    #   heading_deg  initial great-circle bearing of the segment
+    #   accel_mps2   change of speed from the previous segment over the
+    #                time between the two segments' midpoints
+
+    def __init__(self, store, block=KINEMATICS_BLOCK):
+        n = store.total_samples
+        for name in KINEMATICS_COLUMNS:
+            setattr(self, name, np.zeros(n, dtype=np.float32))
+        for a, b, columns in kinematics_blocks(store, block):
+            for name, values in zip(KINEMATICS_COLUMNS, columns):
+                getattr(self, name)[a:b] = values
+
+    def save(self, directory):
+        # One .npy per column, named after it, for load() to memory-map;
+        # write_kinematics() writes the same files without a Kinematics
+        os.makedirs(directory, exist_ok=True)
+        for name in KINEMATICS_COLUMNS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        kinematics = cls.__new__(cls)
+        for name in KINEMATICS_COLUMNS:
+            setattr(kinematics, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode))
+        return kinematics
+
+    @property
+    def nbytes(self):
+        return self.distance_m.nbytes + self.speed_mps.nbytes + self.heading_deg.nbytes + self.accel_mps2.nbytes
+
+def kinematics_blocks(store, block=KINEMATICS_BLOCK):
+    # Yields (a, b, columns) with the float32 columns of samples a..b-1, in
+    # KINEMATICS_COLUMNS order. Each block re-reads the two samples before it
+    # (the previous segment and speed) and the one after it (its last segment).
+    n = store.total_samples
+    for a in range(0, n, block):
+        b = min(a + block, n)
+        lo, hi = max(a - 2, 0), min(b + 1, n)
+        lon, lat, time_ns = store.lon[lo:hi], store.lat[lo:hi], store.time_ns[lo:hi]
+        samples = np.arange(lo, hi)
+        track = np.searchsorted(store.offsets, samples, side="right") - 1
+        first = samples == store.offsets[track]
+        last = samples == store.offsets[track + 1] - 1
+
+        # Segment j joins samples j and j + 1; the pseudo-segments joining one
+        # track to the next are overwritten with the segment before them
+        m = hi - lo
+        distance, speed, heading = np.zeros(m), np.zeros(m), np.zeros(m)
+        dt = np.diff(time_ns) / 1e9
+        distance[:-1] = haversine_m(lon[:-1], lat[:-1], lon[1:], lat[1:])
+        speed[:-1] = np.divide(distance[:-1], dt, out=np.zeros_like(dt), where=dt > 0)
+        heading[:-1] = bearing_deg(lon[:-1], lat[:-1], lon[1:], lat[1:])
+        distance[last] = 0
+        moving = np.flatnonzero(last & ~first)
+        moving = moving[moving > 0]  # The window's first sample only feeds later ones
+        for column in (speed, heading):
+            column[moving] = column[moving - 1]
+            column[last & first] = 0
+
+        # Acceleration uses the stored float32 speeds
+        speed = speed.astype(np.float32).astype(np.float64)
+        accel = np.zeros(m)
+        k = np.arange(1, m)
+        span = (time_ns[np.minimum(k + 1, m - 1)] - time_ns[k - 1]) / 2e9
+        accel[1:] = np.divide(speed[1:] - speed[:-1], span, out=np.zeros_like(span), where=span > 0)
+        accel[first] = 0
+
+        s = slice(a - lo, b - lo)
+        yield a, b, [column[s].astype(np.float32) for column in (distance, speed, heading, accel)]
+
+def write_kinematics(store, directory, block=KINEMATICS_BLOCK):
+    # Streams the columns to the .npy files Kinematics.load() maps, a block
+    # at a time, so memory-mapped stores never need them whole in memory
+    os.makedirs(directory, exist_ok=True)
+    files = [open(os.path.join(directory, f"{name}.npy"), "wb") for name in KINEMATICS_COLUMNS]
+    try:
+        header = {"descr": np.dtype(np.float32).str, "fortran_order": False, "shape": (store.total_samples,)}
+        for f in files:
+            np.lib.format.write_array_header_1_0(f, header)
+        for _, _, columns in kinematics_blocks(store, block):
+            for f, values in zip(files, columns):
+                f.write(values.tobytes())
+    finally:
+        for f in files:
+            f.close()
@@ -0,0 +1,536 @@
+# Rendering helpers shared by the animation scripts
+
+import os
+import time
+
+import numpy as np
+import pygame
+
+from naiad_tracks import TrajectoryStore
+
+# Pixel coordinates are clipped to this range before the int32 cast so deep
+# zoom levels cannot overflow; only far off-screen vertices are affected
+MAX_PIXEL = 1 << 24
+# Consecutive segments of a track packed under one bounding box in SegmentIndex
+SEGMENT_CHUNK = 64
+# Samples processed per pass when building indexes and detail levels, so the
+# temporaries stay bounded for memory-mapped stores larger than RAM
+BUILD_BLOCK = 1 << 22
+# Entries in a trail colour lookup table
+LUT_SIZE = 256
+# Blue -> cyan -> green -> yellow -> red, low values to high
+SPEED_COLOR_STOPS = ((0, 0, 255), (0, 255, 255), (0, 255, 0), (255, 255, 0), (255, 0, 0))
+# Samples used to pick a shading range robust to spikes
+SHADING_SAMPLE = 1 << 20
+# Trail surfaces kept per view so seeks redraw only from the nearest one: one
+# per TRAIL_CHECKPOINT_VERTICES on-screen trail vertices drawn, at most
+# TRAIL_CHECKPOINTS (each is a window-sized copy, 3.7 MB at 1280x720)
+TRAIL_CHECKPOINTS = 32
+TRAIL_CHECKPOINT_VERTICES = 10_000
+# Detail levels keeping more samples than this are not copied into memory;
+# those zooms draw straight from the (possibly memory-mapped) full store
+MAX_LEVEL_SAMPLES = 1 << 22
+
+# View transform
+
+class ViewTransform:
+    # Equirectangular world view (lon -180..180, lat 90..-90 fill the window)
+    # scaled by zoom and shifted by pan. Projects whole lon/lat arrays at
+    # once; version changes whenever the view does so layers can rebuild.
+
+    def __init__(self, width, height, zoom=1.0, pan_x=0, pan_y=0):
+        self.width = width
+        self.height = height
+        self.zoom = zoom
+        self.pan_x = pan_x
+        self.pan_y = pan_y
+        self.version = 0
+
+    def _changed(self):
+        self.version += 1
+
+    def pan_by(self, dx, dy):
+        self.pan_x += dx
+        self.pan_y += dy
+        self._changed()
+
+    def zoom_to(self, zoom, anchor):
+        # Keeps the world point under the anchor pixel fixed
+        ax, ay = anchor
+        ratio = zoom / self.zoom
+        self.pan_x = ax - (ax - self.pan_x) * ratio
+        self.pan_y = ay - (ay - self.pan_y) * ratio
+        self.zoom = zoom
+        self._changed()
+
+    def project(self, lon, lat):
+        sx = self.width / 360 * self.zoom
+        sy = self.height / 180 * self.zoom
+        x = (np.asarray(lon, dtype=np.float64) + 180) * sx + self.pan_x
+        y = (90 - np.asarray(lat, dtype=np.float64)) * sy + self.pan_y
+        x = np.clip(x, -MAX_PIXEL, MAX_PIXEL).astype(np.int32)
+        y = np.clip(y, -MAX_PIXEL, MAX_PIXEL).astype(np.int32)
+        return x, y
+
+    def world_bounds(self, margin=0):
+        # (lon_min, lat_min, lon_max, lat_max) covered by the window, grown by margin pixels
+        sx = self.width / 360 * self.zoom
+        sy = self.height / 180 * self.zoom
+        lon_min = (-margin - self.pan_x) / sx - 180
+        lon_max = (self.width + margin - self.pan_x) / sx - 180
+        lat_max = 90 - (-margin - self.pan_y) / sy
+        lat_min = 90 - (self.height + margin - self.pan_y) / sy
+        return lon_min, lat_min, lon_max, lat_max
+
+# Spatial index
+
+class SegmentIndex:
+    # Flat packed R-tree over a store's segments: every run of chunk_size
+    # consecutive segments of a track shares one bounding box, so a viewport
+    # query is a single vectorised overlap test over the boxes.
+
+    def __init__(self, store, chunk_size=SEGMENT_CHUNK, block=BUILD_BLOCK):
+        self.chunk_size = chunk_size
+        lengths = np.diff(store.offsets)
+        # A track of L samples has L - 1 segments in ceil((L - 1) / chunk_size) chunks
+        chunks = np.where(lengths > 1, (lengths - 2) // chunk_size + 1, 0)
+        self.chunk_offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        np.cumsum(chunks, out=self.chunk_offsets[1:])
+
+        # Global index of the first segment of every chunk
+        track = np.repeat(np.arange(len(chunks)), chunks)
+        local = np.arange(int(self.chunk_offsets[-1])) - self.chunk_offsets[track]
+        starts = store.offsets[track] + local * chunk_size
+
+        total = len(starts)
+        self.lon_min, self.lon_max = np.empty(total), np.empty(total)
+        self.lat_min, self.lat_max = np.empty(total), np.empty(total)
+        joins = store.offsets[1:-1] - 1
+        n_segments = max(store.total_samples - 1, 0)
+        step = max(block // chunk_size, 1)
+        for c0 in range(0, total, step):
+            # Boxes for chunks c0:c1, whose segments run from s0 to s1
+            c1 = min(c0 + step, total)
+            s0 = int(starts[c0])
+            s1 = int(starts[c1]) if c1 < total else n_segments
+            lon = np.asarray(store.lon[s0:s1 + 1], dtype=np.float64)
+            lat = np.asarray(store.lat[s0:s1 + 1], dtype=np.float64)
+
+            # Per-segment boxes; the pseudo-segments joining one track to the
+            # next are neutralised so they never widen a chunk's box
+            seg_lon_min, seg_lon_max = np.minimum(lon[:-1], lon[1:]), np.maximum(lon[:-1], lon[1:])
+            seg_lat_min, seg_lat_max = np.minimum(lat[:-1], lat[1:]), np.maximum(lat[:-1], lat[1:])
+            block_joins = joins[(joins >= s0) & (joins < s1)] - s0
+            for lo_arr, hi_arr in ((seg_lon_min, seg_lon_max), (seg_lat_min, seg_lat_max)):
+                lo_arr[block_joins] = np.inf
+                hi_arr[block_joins] = -np.inf
+
+            at = starts[c0:c1] - s0
+            self.lon_min[c0:c1] = np.minimum.reduceat(seg_lon_min, at)
+            self.lon_max[c0:c1] = np.maximum.reduceat(seg_lon_max, at)
+            self.lat_min[c0:c1] = np.minimum.reduceat(seg_lat_min, at)
+            self.lat_max[c0:c1] = np.maximum.reduceat(seg_lat_max, at)
+
+    def query(self, bounds):
+        # Boolean mask over chunks whose box overlaps (lon_min, lat_min, lon_max, lat_max)
+        lon_min, lat_min, lon_max, lat_max = bounds
+        return ((self.lon_max >= lon_min) & (self.lon_min <= lon_max)
+                & (self.lat_max >= lat_min) & (self.lat_min <= lat_max))
+
+    def runs(self, t, visible, lo, hi):
+        # Vertex ranges [a, b) of track t inside [lo, hi) whose segments lie in
+        # visible chunks; neighbouring visible chunks are merged into one range
+        if hi - lo < 2:
+            return []
+        size = self.chunk_size
+        first = int(self.chunk_offsets[t])
+        c_lo, c_hi = lo // size, (hi - 2) // size + 1
+        vis = visible[first + c_lo:first + c_hi].astype(np.int8)
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], vis, [0]))))
+        return [(max(lo, (c_lo + r0) * size), min(hi, (c_lo + r1) * size + 1))
+                for r0, r1 in zip(edges[::2], edges[1::2])]
+
+# Level of detail
+
+def decimate_indices(store, cell, block=BUILD_BLOCK):
+    # Keeps a sample only when it leaves the grid cell (cell degrees wide) of
+    # the sample before it; the first and last sample of every track are kept
+    n = store.total_samples
+    kept = []
+    for a in range(0, n, block):
+        # Each block re-reads the sample before it to compare across the seam
+        lo = max(a - 1, 0)
+        b = min(a + block, n)
+        cx = np.floor(np.asarray(store.lon[lo:b], dtype=np.float64) / cell)
+        cy = np.floor(np.asarray(store.lat[lo:b], dtype=np.float64) / cell)
+        moved = (cx[1:] != cx[:-1]) | (cy[1:] != cy[:-1])
+        kept.append(np.flatnonzero(moved) + lo + 1)
+    ends = np.concatenate((store.offsets[:-1], store.offsets[1:] - 1))
+    return np.unique(np.concatenate(kept + [ends]))
+
+class DetailLevel:
+    # A decimated copy of a store with its segment index; source maps its
+    # samples back to indices in the full-resolution store (None when this
+    # is the full store)
+
+    def __init__(self, store, cell, source=None):
+        self.store = store
+        self.cell = cell
+        self.source = source
+        self.index = SegmentIndex(store)
+
+    def counts(self, full_store, counts):
+        # How many of this level's samples are among the first counts[t] of
+        # every track t; source is sorted, so one search covers all tracks
+        counts = np.asarray(counts, dtype=np.int64)
+        if self.source is None:
+            return counts
+        return np.searchsorted(self.source, full_store.offsets[:-1] + counts) - self.store.offsets[:-1]
+
+class TrailPyramid:
+    # Multi-resolution copies of a store built once at load time, coarsest
+    # first. Level cells halve from two screen pixels at zoom 1 until a
+    # level would keep more than keep_ratio of the samples (or more than
+    # max_level_samples); closer zooms use the full store.
+
+    def __init__(self, store, width, height, keep_ratio=0.5, max_levels=32, max_level_samples=MAX_LEVEL_SAMPLES):
+        self.px_per_deg = max(width / 360, height / 180)
+        self.full = DetailLevel(store, 0.0)
+        self.levels = []
+        cell = 2 / self.px_per_deg
+        while len(self.levels) < max_levels and store.total_samples:
+            source = decimate_indices(store, cell)
+            if len(source) > min(keep_ratio * store.total_samples, max_level_samples):
+                break
+            offsets = np.searchsorted(source, store.offsets)
+            level_store = TrajectoryStore(store.track_ids, offsets, store.lon[source], store.lat[source], store.time_ns[source])
+            self.levels.append(DetailLevel(level_store, cell, source))
+            cell /= 2
+
+    def save(self, directory):
+        # Level cells and columns as .npy files, so a later load() maps them
+        # instead of decimating the whole store again
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "level_cells.npy"), np.array([level.cell for level in self.levels], dtype=np.float64))
+        for i, level in enumerate(self.levels):
+            for name in ("offsets", "lon", "lat", "time_ns"):
+                np.save(os.path.join(directory, f"level{i}_{name}.npy"), getattr(level.store, name))
+            np.save(os.path.join(directory, f"level{i}_source.npy"), level.source)
+
+    @classmethod
+    def load(cls, directory, store, width, height, mmap_mode="r"):
+        # The levels saved for store by save(); only the segment indexes are rebuilt
+        pyramid = cls.__new__(cls)
+        pyramid.px_per_deg = max(width / 360, height / 180)
+        pyramid.full = DetailLevel(store, 0.0)
+        pyramid.levels = []
+        for i, cell in enumerate(np.load(os.path.join(directory, "level_cells.npy")).tolist()):
+            offsets, lon, lat, time_ns, source = (np.load(os.path.join(directory, f"level{i}_{name}.npy"), mmap_mode=mmap_mode)
+                                                  for name in ("offsets", "lon", "lat", "time_ns", "source"))
+            pyramid.levels.append(DetailLevel(TrajectoryStore(store.track_ids, offsets, lon, lat, time_ns), cell, source))
+        return pyramid
+
+    def level_for(self, zoom):
+        # Coarsest level whose cell is no wider than one pixel at this zoom
+        deg_per_px = 1 / (self.px_per_deg * zoom)
+        for level in self.levels:
+            if level.cell <= deg_per_px:
+                return level
+        return self.full
+
+# Trail shading
+
+def build_color_lut(stops, size=LUT_SIZE):
+    # (size, 3) uint8 table interpolated linearly between evenly spaced colour stops
+    stops = np.asarray(stops, dtype=np.float64)
+    at = np.linspace(0, len(stops) - 1, size)
+    return np.column_stack([np.interp(at, np.arange(len(stops)), stops[:, c]) for c in range(3)]).round().astype(np.uint8)
+
+class TrailShading:
+    # Colours trail segments by a per-sample value (speed, time, ...) aligned
+    # with the full store. Values are quantised once per detail level into
+    # LUT indices, so drawing is a table lookup; the range defaults to the
+    # 2nd..98th percentile so a few spikes do not wash out the scale.
+
+    def __init__(self, values, lut, lo=None, hi=None):
+        self.values = values
+        self.lut = lut
+        if (lo is None or hi is None) and len(values):
+            sample = np.asarray(values[::max(1, len(values) // SHADING_SAMPLE)], dtype=np.float64)
+            p_lo, p_hi = np.percentile(sample, (2, 98))
+            lo = p_lo if lo is None else lo
+            hi = p_hi if hi is None else hi
+        self.lo = float(lo or 0)
+        self.hi = float(hi if hi is not None and hi > self.lo else self.lo + 1)
+        self._indices = {}
+
+    def index(self, values):
+        scaled = (np.asarray(values, dtype=np.float64) - self.lo) * ((len(self.lut) - 1) / (self.hi - self.lo))
+        return np.clip(scaled, 0, len(self.lut) - 1).astype(np.uint8)
+
+    def level_indices(self, level):
+        # LUT index per sample of a detail level, computed on first use
+        indices = self._indices.get(id(level))
+        if indices is None:
+            values = self.values if level.source is None else self.values[level.source]
+            indices = self._indices[id(level)] = self.index(values)
+        return indices
+
+def rasterize_segments(x0, y0, x1, y1, width, height):
+    # Pixels of the straight segments (x0, y0)-(x1, y1) clipped to a
+    # width x height surface (Liang-Barsky, then one sample per pixel step).
+    # Returns pixel x, y and the index of the segment each pixel belongs to.
+    x0, y0, x1, y1 = (np.asarray(a, dtype=np.float64) for a in (x0, y0, x1, y1))
+    dx, dy = x1 - x0, y1 - y0
+    t0, t1 = np.zeros(len(x0)), np.ones(len(x0))
+    inside = np.ones(len(x0), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for p, q in ((-dx, x0), (dx, width - 1 - x0), (-dy, y0), (dy, height - 1 - y0)):
+            r = q / p
+            inside &= (p != 0) | (q >= 0)
+            t0 = np.where(p < 0, np.maximum(t0, r), t0)
+            t1 = np.where(p > 0, np.minimum(t1, r), t1)
+    keep = np.flatnonzero(inside & (t0 <= t1))
+    cx0, cy0 = x0[keep] + t0[keep] * dx[keep], y0[keep] + t0[keep] * dy[keep]
+    cdx, cdy = (t1[keep] - t0[keep]) * dx[keep], (t1[keep] - t0[keep]) * dy[keep]
+
+    steps = np.ceil(np.maximum(np.abs(cdx), np.abs(cdy))).astype(np.int64)
+    seg = np.repeat(np.arange(len(keep)), steps + 1)
+    first = np.cumsum(steps + 1) - (steps + 1)
+    f = (np.arange(len(seg)) - first[seg]) / np.maximum(steps, 1)[seg]
+    xs = np.clip(np.rint(cx0[seg] + f * cdx[seg]), 0, width - 1).astype(np.intp)
+    ys = np.clip(np.rint(cy0[seg] + f * cdy[seg]), 0, height - 1).astype(np.intp)
+    return xs, ys, keep[seg]
+
+# Trail layer
+
+class TrailLayer:
+    # Off-screen surface holding every trail segment drawn so far. Each
+    # frame only the segments passed since the previous frame are added.
+    # View changes are picked up from view.version, which is also when the
+    # pyramid level and the on-screen chunks of its segment index are
+    # chosen; the owner calls invalidate() when the store changes.
+    # Copies of the surface are kept every checkpoint_vertices vertices
+    # drawn (spread further apart when the view shows more of the trail
+    # than max_checkpoints copies cover), so a seek either way restores the
+    # nearest earlier copy and redraws only the segments after it.
+
+    def __init__(self, size, width=2, max_checkpoints=TRAIL_CHECKPOINTS, checkpoint_vertices=TRAIL_CHECKPOINT_VERTICES):
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self.width = width
+        self.max_checkpoints = max_checkpoints
+        self.checkpoint_vertices = checkpoint_vertices
+        self.spacing = checkpoint_vertices
+        self.checkpoints = []
+        self.drawn = None
+        self.vertices = 0
+        self.counts = None
+        self.level = None
+        self.visible = None
+        self.view_version = None
+
+    def invalidate(self):
+        self.drawn = None
+        self.checkpoints = []
+
+    def _clear(self, n_tracks):
+        self.surface.fill((0, 0, 0, 0))
+        self.drawn = [0] * n_tracks
+        self.vertices = 0
+
+    def _restore(self, counts, backward):
+        # Latest checkpoint not past counts for any track, or False. Going
+        # forward it is only used when it saves redrawing at least
+        # checkpoint_vertices vertices.
+        for _, cp_counts, surface, drawn, vertices in reversed(self.checkpoints):
+            if all(c <= k for c, k in zip(cp_counts, counts)):
+                if not backward and vertices - self.vertices < self.checkpoint_vertices:
+                    return False
+                # Cleared first: a per-pixel alpha blit blends over what is there
+                self.surface.fill((0, 0, 0, 0))
+                self.surface.blit(surface, (0, 0))
+                self.drawn = list(drawn)
+                self.vertices = vertices
+                return True
+        return False
+
+    def _project_runs(self, runs, view):
+        # Level sample indices of every vertex of runs, concatenated, with
+        # their pixels from a single projection and each run's length
+        starts = np.array([a for a, _ in runs], dtype=np.int64)
+        lengths = np.array([b - a for a, b in runs], dtype=np.int64)
+        vertex = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(int(lengths.sum()))
+        xs, ys = view.project(self.level.store.lon[vertex], self.level.store.lat[vertex])
+        return vertex, xs, ys, lengths
+
+    def _draw_flat(self, runs, run_tracks, colors, view):
+        # One polyline per on-screen run in its track's colour
+        _, xs, ys, lengths = self._project_runs(runs, view)
+        points = np.column_stack((xs, ys)).tolist()
+        ends = np.cumsum(lengths).tolist()
+        return [pygame.draw.lines(self.surface, colors[t], False, points[end - n:end], self.width)
+                for t, n, end in zip(run_tracks, lengths.tolist(), ends)]
+
+    def _draw_shaded(self, runs, view, shading):
+        # Every new segment of every track is projected, rasterised and
+        # coloured in one batch, then written with a single fancy-indexed
+        # store per colour channel; one dirty rect per run is returned
+        level = self.level
+        vertex, xs, ys, lengths = self._project_runs(runs, view)
+        # Segments join each vertex to the next one of the same run
+        seg = np.ones(len(vertex), dtype=bool)
+        seg[np.cumsum(lengths) - 1] = False
+        seg = np.flatnonzero(seg)
+
+        w, h = self.surface.get_size()
+        px, py, pseg = rasterize_segments(xs[seg], ys[seg], xs[seg + 1], ys[seg + 1], w, h)
+        if not len(px):
+            return []
+        colors = shading.lut[shading.level_indices(level)[vertex[seg[pseg]]]]
+
+        # A width x width brush: every pixel is repeated right and down
+        pixels = pygame.surfarray.pixels3d(self.surface)
+        alpha = pygame.surfarray.pixels_alpha(self.surface)
+        for sx in range(self.width):
+            for sy in range(self.width):
+                bx, by = np.minimum(px + sx, w - 1), np.minimum(py + sy, h - 1)
+                pixels[bx, by] = colors
+                alpha[bx, by] = 255
+        del pixels, alpha  # Unlocks the surface
+
+        # Pixels come out grouped by run, so each run's bounding rect is a reduceat
+        run = np.repeat(np.arange(len(runs)), lengths - 1)[pseg]
+        bounds = np.flatnonzero(np.diff(run)) + 1
+        at = np.concatenate(([0], bounds))
+        x_lo, x_hi = np.minimum.reduceat(px, at), np.maximum.reduceat(px, at)
+        y_lo, y_hi = np.minimum.reduceat(py, at), np.maximum.reduceat(py, at)
+        return [pygame.Rect(int(x), int(y), int(x2 - x + self.width), int(y2 - y + self.width))
+                for x, y, x2, y2 in zip(x_lo, y_lo, x_hi, y_hi)]
+
+    def _checkpoint(self, counts):
+        # Slot i starts i spacings of vertices into the trail; at most one
+        # copy is taken per slot, and the list stays in slot order
+        slot = min(self.vertices // self.spacing, self.max_checkpoints)
+        if slot and all(cp[0] != slot for cp in self.checkpoints):
+            self.checkpoints.append((slot, list(counts), self.surface.copy(), list(self.drawn), self.vertices))
+            self.checkpoints.sort(key=lambda cp: cp[0])
+
+    def update(self, store, counts, colors, view, pyramid=None, shading=None):
+        # counts[t]: number of samples of track t the trail should cover.
+        # With shading, segments take their colour from its LUT instead of
+        # colors[t]. Returns the rectangles of the surface that changed.
+        changed = []
+        if self.drawn is None or self.view_version != view.version:
+            self.checkpoints = []
+            self._clear(len(counts))
+            self.view_version = view.version
+            if pyramid:
+                self.level = pyramid.level_for(view.zoom)
+            elif self.level is None or self.level.store is not store:
+                self.level = DetailLevel(store, 0.0)
+            self.visible = self.level.index.query(view.world_bounds(self.width))
+            # Vertices on screen are at most a chunk's worth per visible chunk
+            on_screen = int(self.visible.sum()) * self.level.index.chunk_size
+            self.spacing = max(self.checkpoint_vertices, on_screen // (self.max_checkpoints + 1))
+            changed.append(self.surface.get_rect())
+        elif any(k < c for k, c in zip(counts, self.counts)):
+            # Moved backwards; later checkpoints stay for seeking forward again
+            if not self._restore(counts, True):
+                self._clear(len(counts))
+            changed.append(self.surface.get_rect())
+        elif self._restore(counts, False):
+            # Jumped forward past a checkpoint taken earlier
+            changed.append(self.surface.get_rect())
+        self.counts = list(counts)
+
+        # The new on-screen runs of every track are gathered first and then
+        # drawn in one batch
+        level = self.level
+        runs, run_tracks = [], []
+        offsets = level.store.offsets[:-1].tolist()
+        for t, m in enumerate(level.counts(store, counts).tolist()):
+            start = max(self.drawn[t], 1)
+            if start < m:
+                for a, b in level.index.runs(t, self.visible, start - 1, m):
+                    runs.append((offsets[t] + a, offsets[t] + b))
+                    run_tracks.append(t)
+                    self.vertices += b - a
+            self.drawn[t] = max(self.drawn[t], m)
+        if runs:
+            changed.extend(self._draw_shaded(runs, view, shading) if shading else self._draw_flat(runs, run_tracks, colors, view))
+        self._checkpoint(counts)
+        # After a rebuild or restore the whole surface is the only rect needed
+        return changed[:1] if changed and changed[0] == self.surface.get_rect() else changed
+
+# Compositing
+
+class Compositor:
+    # Treats the window surface as a persistent back buffer. The static
+    # layers (background below the trail, button panel above everything)
+    # are rendered once; each frame only the dirty rectangles are restored
+    # from them, redrawn and pushed with pygame.display.update.
+
+    def __init__(self, screen, background, overlay):
+        self.screen = screen
+        self.background = background
+        self.overlay = overlay
+        self.previous = []
+        self.restored = []
+        self.full = True
+
+    def invalidate(self):
+        self.full = True
+
+    def begin(self, trail=None, trail_rects=()):
+        # Restores last frame's dynamic rects plus whatever the trail changed;
+        # a trail rebuilt as a whole makes this a full frame
+        screen_rect = self.screen.get_rect()
+        if not self.full and any(rect == screen_rect for rect in trail_rects):
+            self.full = True
+        if self.full:
+            self.restored = [screen_rect]
+        else:
+            self.restored = self.previous + list(trail_rects)
+        for rect in self.restored:
+            self.screen.blit(self.background, rect, rect)
+            if trail is not None:
+                self.screen.blit(trail, rect, rect)
+
+    def end(self, drawn_rects):
+        # drawn_rects: everything drawn on top of the restored areas this frame
+        dirty = self.restored if self.full else self.restored + drawn_rects
+        for rect in dirty:
+            self.screen.blit(self.overlay, rect, rect)
+        pygame.display.update(dirty)
+        self.previous = drawn_rects
+        self.full = False
+
+# HUD text
+
+class HudText:
+    # Font rendering cache for the HUD. Fixed strings (button labels) are
+    # rendered once; each track's status line is re-rendered only when one
+    # of its displayed values changes.
+
+    def __init__(self, font, color=(255, 255, 255)):
+        self.font = font
+        self.color = color
+        self._labels = {}
+        self._track_keys = {}
+        self._track_labels = {}
+
+    def label(self, text):
+        surface = self._labels.get(text)
+        if surface is None:
+            surface = self._labels[text] = self.font.render(text, True, self.color)
+        return surface
+
+    def track_label(self, t, track_id, lon, lat, time_ns, speed_mps=None, heading_deg=None):
+        motion = "" if speed_mps is None else f", Speed: {speed_mps:.1f} m/s, Hdg: {heading_deg:03.0f}"
+        key = (track_id, f"{lon:.2f}", f"{lat:.2f}", motion, time_ns // 1_000_000_000)
+        if self._track_keys.get(t) != key:
+            clock_text = time.strftime("%H:%M:%S", time.gmtime(key[4]))
+            text = f"Track {track_id}, Lon: {key[1]}, Lat: {key[2]}{motion}, Time: {clock_text}"
+            self._track_labels[t] = self.font.render(text, True, self.color)
+            self._track_keys[t] = key
+        return self._track_labels[t]
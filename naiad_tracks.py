@@ -0,0 +1,327 @@
+# Columnar trajectory storage shared by the animation scripts
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# Time conversion
+
+def to_epoch_ns(series):
+    # Timestamps are kept as int64 nanoseconds since the epoch (UTC);
+    # columns already in that form are passed through
+    if getattr(series.dtype, "kind", None) in ("i", "u"):
+        return series.to_numpy(dtype=np.int64)
+    if getattr(series.dt, "tz", None) is not None:
+        series = series.dt.tz_convert(None)
+    return series.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+# Batched interpolation
+
+def calculate_steps_batch(lon, lat, time_ns):
+    # Same 5..50 clamp as calculate_steps, for every consecutive pair at once
+    dist = np.hypot(np.diff(lon), np.diff(lat))
+    time_diff = np.diff(time_ns) / 1e9
+    return np.clip(np.trunc(dist * time_diff / 1000), 5, 50).astype(np.int64)
+
+def interpolate_track(lon, lat, time_ns):
+    # Expands one time-sorted track like chaining interpolate_points over its
+    # segments: steps[j] samples per segment, the last raw point excluded.
+    # Positions match it bit for bit; times are exact rather than truncated
+    # from a float product, so they can differ from it by a few ns on long gaps.
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    time_ns = np.asarray(time_ns, dtype=np.int64)
+    if len(lon) < 2:
+        return np.empty(0), np.empty(0), np.empty(0, dtype=np.int64)
+
+    steps = calculate_steps_batch(lon, lat, time_ns)
+    seg = np.repeat(np.arange(len(steps)), steps)
+    starts = np.cumsum(steps) - steps
+    i = np.arange(len(seg)) - starts[seg]
+    f = i / steps[seg]
+
+    out_lon = lon[seg] + f * (lon[seg + 1] - lon[seg])
+    out_lat = lat[seg] + f * (lat[seg + 1] - lat[seg])
+    # Times are floor(dt * i / steps) in integer arithmetic, split through
+    # divmod so dt * i cannot overflow on long gaps
+    q, r = np.divmod(time_ns[seg + 1] - time_ns[seg], steps[seg])
+    out_time = time_ns[seg] + q * i + r * i // steps[seg]
+    return out_lon, out_lat, out_time
+
+# Trajectory store
+
+def as_column(values, dtypes):
+    # Keeps contiguous arrays (including memory maps) of an accepted dtype
+    # as they are; anything else is converted to the first dtype
+    array = np.asarray(values)
+    if array.dtype in dtypes and array.flags.c_contiguous:
+        return array
+    return np.ascontiguousarray(array, dtype=dtypes[0])
+
+class TrajectoryStore:
+    # All tracks live in one set of contiguous buffers; track i owns the
+    # samples offsets[i]:offsets[i + 1] of lon, lat and time_ns. lon/lat
+    # may be float32 for compact files; time_ns is always int64.
+
+    def __init__(self, track_ids, offsets, lon, lat, time_ns):
+        self.track_ids = list(track_ids)
+        self.offsets = as_column(offsets, (np.int64,))
+        self.lon = as_column(lon, (np.float64, np.float32))
+        self.lat = as_column(lat, (np.float64, np.float32))
+        self.time_ns = as_column(time_ns, (np.int64,))
+
+    @classmethod
+    def from_tracks(cls, tracks):
+        # tracks: iterable of (track_id, lon, lat, time_ns); empty tracks are dropped
+        track_ids, lons, lats, times = [], [], [], []
+        for track_id, lon, lat, time_ns in tracks:
+            if len(lon) == 0:
+                continue
+            track_ids.append(track_id)
+            lons.append(lon)
+            lats.append(lat)
+            times.append(time_ns)
+
+        lengths = [len(lon) for lon in lons]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        if not lons:
+            empty = np.empty(0)
+            return cls(track_ids, offsets, empty, empty, empty.astype(np.int64))
+        return cls(track_ids, offsets, np.concatenate(lons), np.concatenate(lats), np.concatenate(times))
+
+    def save(self, directory, allow_pickle=True):
+        # One .npy per column so load() can memory-map them. Ids of a single
+        # type are stored as a plain array; mixed types need pickling, which
+        # raises ValueError when allow_pickle is False.
+        os.makedirs(directory, exist_ok=True)
+        if len({type(track_id) for track_id in self.track_ids}) <= 1:
+            track_ids = np.array(self.track_ids)
+        elif allow_pickle:
+            track_ids = np.array(self.track_ids, dtype=object)
+        else:
+            raise ValueError("mixed track id types cannot be saved without pickling")
+        np.save(os.path.join(directory, "track_ids.npy"), track_ids, allow_pickle=allow_pickle)
+        for name in ("offsets", "lon", "lat", "time_ns"):
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r", allow_pickle=True):
+        # With mmap_mode set, processes opening the same directory share the
+        # columns through the page cache instead of holding private copies
+        track_ids = np.load(os.path.join(directory, "track_ids.npy"), allow_pickle=allow_pickle).tolist()
+        columns = [np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in ("offsets", "lon", "lat", "time_ns")]
+        return cls(track_ids, *columns)
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    @property
+    def total_samples(self):
+        return int(self.offsets[-1])
+
+    def track_length(self, i):
+        return int(self.offsets[i + 1] - self.offsets[i])
+
+    def track_slice(self, i):
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def track(self, i):
+        # Zero-copy views of one track's columns
+        s = self.track_slice(i)
+        return self.lon[s], self.lat[s], self.time_ns[s]
+
+    def locate(self, i, t_ns):
+        # Binary search on track i's timestamps. Returns how many samples lie
+        # at or before t_ns and the position/time linearly interpolated there,
+        # clamped to the first and last sample.
+        lon, lat, times = self.track(i)
+        k = int(np.searchsorted(times, t_ns, side="right"))
+        if k == 0:
+            return 0, float(lon[0]), float(lat[0]), int(times[0])
+        if k == len(times):
+            return k, float(lon[-1]), float(lat[-1]), int(times[-1])
+        j = k - 1
+        f = (t_ns - times[j]) / (times[k] - times[j])
+        return k, float(lon[j] + f * (lon[k] - lon[j])), float(lat[j] + f * (lat[k] - lat[j])), int(t_ns)
+
+def partition_tracks(ids, time_ns):
+    # One stable lexsort on (id, time) over all rows. Returns the sorted
+    # unique track ids, the row order that groups rows by track in time
+    # order, and the offsets of each track's run in that order. Rows with
+    # a missing id (NaN/None) are left out of the order, as groupby drops them.
+    ids = np.asarray(ids)
+    time_ns = np.asarray(time_ns)
+    rows = None
+    missing = pd.isna(ids)
+    if missing.any():
+        rows = np.flatnonzero(~missing)
+        ids, time_ns = ids[rows], time_ns[rows]
+    unique_ids, codes = np.unique(ids, return_inverse=True)
+    order = np.lexsort((time_ns, codes))
+    offsets = np.zeros(len(unique_ids) + 1, dtype=np.int64)
+    offsets[1:-1] = np.flatnonzero(np.diff(codes[order])) + 1
+    offsets[-1] = len(order)
+    if rows is not None:
+        order = rows[order]
+    track_ids = [track_id.item() if isinstance(track_id, np.generic) else track_id for track_id in unique_ids]
+    return track_ids, order, offsets
+
+# Incremental store building
+
+class GrowableColumns:
+    # lon/lat/time_ns arrays for one track that double their capacity as
+    # batches are appended, so streaming ingest never re-concatenates
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.lon = np.empty(capacity)
+        self.lat = np.empty(capacity)
+        self.time_ns = np.empty(capacity, dtype=np.int64)
+
+    def append(self, lon, lat, time_ns):
+        end = self.size + len(lon)
+        if end > len(self.lon):
+            capacity = max(end, 2 * len(self.lon))
+            for name in ("lon", "lat", "time_ns"):
+                grown = np.empty(capacity, dtype=getattr(self, name).dtype)
+                grown[:self.size] = getattr(self, name)[:self.size]
+                setattr(self, name, grown)
+        self.lon[self.size:end] = lon
+        self.lat[self.size:end] = lat
+        self.time_ns[self.size:end] = time_ns
+        self.size = end
+
+class TrackBuilder:
+    # Collects samples batch by batch (in any track and time order) and
+    # assembles them into a TrajectoryStore with tracks ordered by id and
+    # samples by time
+
+    def __init__(self):
+        self.tracks = {}
+
+    def append(self, track_ids, lon, lat, time_ns):
+        # Rows of one batch are grouped per track with partition_tracks
+        chunk_ids, order, offsets = partition_tracks(track_ids, time_ns)
+        lon, lat, time_ns = lon[order], lat[order], time_ns[order]
+        for i, track_id in enumerate(chunk_ids):
+            s = slice(int(offsets[i]), int(offsets[i + 1]))
+            columns = self.tracks.get(track_id)
+            if columns is None:
+                columns = self.tracks[track_id] = GrowableColumns()
+            columns.append(lon[s], lat[s], time_ns[s])
+
+    def build(self, interpolate=False, release=True):
+        # With release=False the buffers are kept, so a partial store can be
+        # built while more batches are still being appended
+        try:
+            track_ids = sorted(self.tracks)
+        except TypeError:
+            track_ids = list(self.tracks)  # Mixed id types keep first-seen order
+
+        def build_tracks():
+            # Each track's buffers are released as soon as it is written out
+            for track_id in track_ids:
+                columns = self.tracks.pop(track_id) if release else self.tracks[track_id]
+                n = columns.size
+                lon, lat, time_ns = columns.lon[:n], columns.lat[:n], columns.time_ns[:n]
+                if np.any(time_ns[1:] < time_ns[:-1]):
+                    # Only tracks whose chunks arrived out of time order need a re-sort
+                    order = np.argsort(time_ns, kind="stable")
+                    lon, lat, time_ns = lon[order], lat[order], time_ns[order]
+                if interpolate:
+                    lon, lat, time_ns = interpolate_track(lon, lat, time_ns)
+                yield track_id, lon, lat, time_ns
+
+        if interpolate:
+            return TrajectoryStore.from_tracks(build_tracks())
+
+        # Sizes are known up front, so tracks are copied straight into the
+        # final columns instead of being concatenated at the end
+        offsets = np.zeros(len(track_ids) + 1, dtype=np.int64)
+        np.cumsum([self.tracks[track_id].size for track_id in track_ids], out=offsets[1:])
+        total = int(offsets[-1])
+        lon, lat, time_ns = np.empty(total), np.empty(total), np.empty(total, dtype=np.int64)
+        for i, (_, track_lon, track_lat, track_time) in enumerate(build_tracks()):
+            s = slice(int(offsets[i]), int(offsets[i + 1]))
+            lon[s], lat[s], time_ns[s] = track_lon, track_lat, track_time
+        return TrajectoryStore(track_ids, offsets, lon, lat, time_ns)
+
+# Timeline
+
+class Timeline:
+    # Time extents of a store: per-track lengths, offsets and first/last
+    # sample times plus the global start/end. Tracks are time-sorted, so
+    # only two samples per track are read; nothing is merged or copied.
+
+    def __init__(self, store):
+        self.offsets = store.offsets
+        self.lengths = np.diff(store.offsets)
+        self.track_start_ns = store.time_ns[store.offsets[:-1]]
+        self.track_end_ns = store.time_ns[store.offsets[1:] - 1]
+        self.start_ns = int(self.track_start_ns.min()) if len(self.lengths) else 0
+        self.end_ns = int(self.track_end_ns.max()) if len(self.lengths) else 0
+
+    @property
+    def duration_ns(self):
+        return self.end_ns - self.start_ns
+
+    def fraction(self, time_ns):
+        # Position of time_ns along the timeline, 0.0 at the start and 1.0 at the end
+        if self.end_ns <= self.start_ns:
+            return 1.0
+        return min(1.0, max(0.0, (time_ns - self.start_ns) / (self.end_ns - self.start_ns)))
+
+    def time_at(self, fraction):
+        return self.start_ns + int(round(min(1.0, max(0.0, fraction)) * self.duration_ns))
+
+    def finished(self, time_ns):
+        return time_ns >= self.end_ns
+
+# Playback clock
+
+class PlaybackClock:
+    # Simulated mission time is the source of truth for playback; every
+    # track is sampled at the same instant so drones stay time-aligned.
+
+    def __init__(self, timeline):
+        self.timeline = timeline
+        self.time_ns = timeline.start_ns
+
+    def reset(self):
+        self.time_ns = self.timeline.start_ns
+
+    def seek(self, time_ns):
+        # Clamped to the timeline's extents
+        self.time_ns = min(self.timeline.end_ns, max(self.timeline.start_ns, int(time_ns)))
+
+    def advance(self, mission_seconds):
+        self.seek(self.time_ns + int(mission_seconds * 1e9))
+
+    @property
+    def finished(self):
+        return self.timeline.finished(self.time_ns)
+
+    @property
+    def progress(self):
+        return self.timeline.fraction(self.time_ns)
+
+# Fixed-timestep scheduling
+
+class FixedStepScheduler:
+    # Turns measured wall time into a whole number of fixed simulation
+    # steps. Whatever a slow frame costs is caught up on the next one, so
+    # playback keeps wall-clock pace and renders simply merge the steps
+    # they missed; a stall longer than max_frame (window drag, a dialog,
+    # a store swapped in while loading) is dropped rather than jumped over.
+
+    def __init__(self, step=1 / 120, max_frame=0.25):
+        self.step = step
+        self.max_frame = max_frame
+        self.accumulator = 0.0
+
+    def steps(self, dt):
+        self.accumulator += min(dt, self.max_frame)
+        n = int(self.accumulator / self.step)
+        self.accumulator -= n * self.step
+        return n
@@ -0,0 +1,83 @@
+# interpolate_track against the per-segment loops it replaced
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from naiad_tracks import calculate_steps_batch, interpolate_track, to_epoch_ns
+
+# Reference: the original interpolate_points / calculate_steps
+
+def interpolate_points(p1, p2, t1, t2, steps=10):
+    result = []
+    for i in range(steps):
+        f = i / steps
+        lon = p1[0] + f * (p2[0] - p1[0])
+        lat = p1[1] + f * (p2[1] - p1[1])
+        timestamp = t1 + (t2 - t1) * f
+        result.append((lon, lat, timestamp))
+    return result
+
+def calculate_steps(p1, p2, t1, t2):
+    dist = math.hypot(p2[0] - p1[0], p2[1] - p1[1])
+    time_diff = (t2 - t1).total_seconds()
+    return max(5, min(50, int(dist * time_diff / 1000)))
+
+def reference_path(group):
+    path = []
+    for j in range(len(group) - 1):
+        p1 = (group.iloc[j]['lon'], group.iloc[j]['lat'])
+        p2 = (group.iloc[j+1]['lon'], group.iloc[j+1]['lat'])
+        t1 = group.iloc[j]['timestamp']
+        t2 = group.iloc[j+1]['timestamp']
+        steps = calculate_steps(p1, p2, t1, t2)
+        path.extend(interpolate_points(p1, p2, t1, t2, steps))
+    return path
+
+def random_track(n, seed, max_gap_s=5000):
+    rng = np.random.default_rng(seed)
+    gaps = pd.to_timedelta(rng.integers(1, max_gap_s, n), unit="s") + pd.to_timedelta(rng.integers(0, 10 ** 9, n), unit="ns")
+    return pd.DataFrame({
+        "lon": np.cumsum(rng.normal(0, 3, n)),
+        "lat": np.cumsum(rng.normal(0, 3, n)),
+        "timestamp": pd.Timestamp("2025-01-01") + gaps.to_series().cumsum().to_numpy(),
+    })
+
+# Tests
+
+def test_steps_match_calculate_steps():
+    group = random_track(500, seed=0)
+    time_ns = to_epoch_ns(group["timestamp"])
+    expected = [calculate_steps((group.lon[j], group.lat[j]), (group.lon[j + 1], group.lat[j + 1]),
+                                group.timestamp[j], group.timestamp[j + 1]) for j in range(len(group) - 1)]
+    assert calculate_steps_batch(group.lon.to_numpy(), group.lat.to_numpy(), time_ns).tolist() == expected
+
+def test_matches_per_segment_loops():
+    for seed, max_gap_s in ((1, 5000), (2, 10 ** 7)):
+        group = random_track(500, seed, max_gap_s)
+        path = reference_path(group)
+        lon, lat, time_ns = interpolate_track(group.lon.to_numpy(), group.lat.to_numpy(), to_epoch_ns(group.timestamp))
+
+        assert len(lon) == len(path)
+        np.testing.assert_array_equal(lon, [p[0] for p in path])
+        np.testing.assert_array_equal(lat, [p[1] for p in path])
+        # The loops truncate a float product, which is off by a few ns on
+        # long gaps; the batch version is exact (test_times_are_exact)
+        drift = time_ns - np.array([p[2].value for p in path])
+        assert np.abs(drift).max() <= 4
+
+def test_times_are_exact():
+    group = random_track(500, seed=3, max_gap_s=10 ** 7)
+    raw = to_epoch_ns(group.timestamp)
+    _, _, time_ns = interpolate_track(group.lon.to_numpy(), group.lat.to_numpy(), raw)
+    steps = calculate_steps_batch(group.lon.to_numpy(), group.lat.to_numpy(), raw)
+    expected = [int(raw[j]) + (int(raw[j + 1]) - int(raw[j])) * i // int(steps[j])
+                for j in range(len(steps)) for i in range(steps[j])]
+    assert time_ns.tolist() == expected
+
+def test_short_tracks_are_empty():
+    for n in (0, 1):
+        lon, lat, time_ns = interpolate_track(np.zeros(n), np.zeros(n), np.zeros(n, dtype=np.int64))
+        assert len(lon) == len(lat) == len(time_ns) == 0
+        assert time_ns.dtype == np.int64
@@ -0,0 +1,136 @@
+# CSV loading, time parsing and the processed trajectory cache
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from naiad_io import TrajectoryCache, infer_time_format, parse_times, stream_csv
+from naiad_tracks import TrajectoryStore
+
+# Constants
+EPOCH = 1_700_000_000
+
+# Time parsing
+
+def test_fractional_epoch_seconds():
+    expected = [EPOCH * 10 ** 9, EPOCH * 10 ** 9 + 5 * 10 ** 8, (EPOCH + 1) * 10 ** 9, (EPOCH + 1) * 10 ** 9 + 5 * 10 ** 8]
+    values = np.array([EPOCH, EPOCH + 0.5, EPOCH + 1, EPOCH + 1.5])
+    assert parse_times(values).tolist() == expected
+    assert parse_times(values.astype(str).astype(object)).tolist() == expected
+
+def test_integer_epoch_milliseconds_are_exact():
+    values = np.array([EPOCH * 1000 + 1, EPOCH * 1000 + 999], dtype=np.int64)
+    assert parse_times(values).tolist() == (values * 10 ** 6).tolist()
+    assert parse_times(values.astype(str).astype(object)).tolist() == (values * 10 ** 6).tolist()
+
+def test_fractional_epoch_csv(tmp_path):
+    path = tmp_path / "fractional.csv"
+    pd.DataFrame({"id": 1, "lon": [0.0, 0.1, 0.2, 0.3], "lat": 0.0,
+                  "time": [EPOCH, EPOCH + 0.5, EPOCH + 1.0, EPOCH + 1.5]}).to_csv(path, index=False)
+    offsets_ns = [0, 5 * 10 ** 8, 10 ** 9, 15 * 10 ** 8]
+    store = stream_csv(str(path), "lon", "lat", "time")
+    assert (store.time_ns - EPOCH * 10 ** 9).tolist() == offsets_ns
+
+def test_unpadded_day_first_dates_keep_one_order():
+    values = np.array(["13/2/2025 10:00", "1/3/2025 10:00", "2/4/2025 10:00"], dtype=object)
+    kind, formats = infer_time_format(values)
+    assert set(formats.values()) == {"%d/%m/%Y %H:%M"}
+    expected = pd.to_datetime(["2025-02-13 10:00", "2025-03-01 10:00", "2025-04-02 10:00"]).as_unit("ns").asi8
+    assert parse_times(values).tolist() == expected.tolist()
+    # Lengths the sample never showed are read day-first too
+    assert parse_times(np.array(["1/3/2025 9:00"], dtype=object), (kind, formats)).tolist() == [expected[1] - 3600 * 10 ** 9]
+
+def test_ambiguous_dates_stay_month_first():
+    values = np.array(["1/3/2025 10:00", "12/4/2025 10:00"], dtype=object)
+    expected = pd.to_datetime(["2025-01-03 10:00", "2025-12-04 10:00"]).as_unit("ns").asi8
+    assert parse_times(values).tolist() == expected.tolist()
+
+# Track ids
+
+def write_ids_csv(path, ids):
+    pd.DataFrame({"drone_id": ids, "lon": np.arange(len(ids), dtype=float), "lat": 0.0,
+                  "time": EPOCH + np.arange(len(ids))}).to_csv(path, index=False)
+
+def test_rows_without_an_id_are_dropped(tmp_path):
+    path = tmp_path / "blank_string_id.csv"
+    write_ids_csv(path, ["a", "b", None, "a", "b"])
+    store = stream_csv(str(path), "lon", "lat", "time", chunk_size=2)
+    assert store.track_ids == ["a", "b"]
+    assert store.lon.tolist() == [0.0, 3.0, 1.0, 4.0]
+
+def test_numeric_ids_stay_integers(tmp_path):
+    path = tmp_path / "blank_numeric_id.csv"
+    write_ids_csv(path, [1, 2, None, 1, 2])
+    store = stream_csv(str(path), "lon", "lat", "time", chunk_size=2)
+    assert store.track_ids == [1, 2]
+    assert all(type(track_id) is int for track_id in store.track_ids)
+    assert store.offsets.tolist() == [0, 2, 4]
+
+# Processed trajectory cache
+
+def test_cache_directory_is_per_user(monkeypatch, tmp_path):
+    monkeypatch.delenv("NAIAD_CACHE_DIR", raising=False)
+    monkeypatch.delenv("LOCALAPPDATA", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert TrajectoryCache().directory == str(tmp_path / "naiad_vis")
+    monkeypatch.setenv("NAIAD_CACHE_DIR", str(tmp_path / "override"))
+    assert TrajectoryCache().directory == str(tmp_path / "override")
+
+def save_store(store):
+    return lambda directory: store.save(directory, allow_pickle=False)
+
+def load_store(directory):
+    return TrajectoryStore.load(directory, allow_pickle=False)
+
+def test_cache_round_trip(tmp_path):
+    path = tmp_path / "track.csv"
+    write_ids_csv(path, [1, 2, 1, 2])
+    store = stream_csv(str(path), "lon", "lat", "time")
+    cache = TrajectoryCache(str(tmp_path / "cache"))
+    key = cache.key(str(path), "lon", "lat", "time")
+    assert cache.get(key, load_store) is None
+    cache.put(key, save_store(store))
+    cached = cache.get(key, load_store)
+    assert cached.track_ids == store.track_ids
+    assert not cached.time_ns.flags.writeable  # Mapped read-only, not copied
+    assert np.array_equal(cached.time_ns, store.time_ns)
+
+def test_mixed_ids_are_not_pickled(tmp_path):
+    store = TrajectoryStore.from_tracks([("a", [0.0], [0.0], [0]), (1, [0.0], [0.0], [0])])
+    cache = TrajectoryCache(str(tmp_path / "cache"))
+    with pytest.raises(ValueError):
+        cache.put("key", save_store(store))
+    assert os.listdir(cache.directory) == []
+
+def test_failed_cache_write_leaves_no_entry(tmp_path):
+    cache = TrajectoryCache(str(tmp_path / "cache"))
+
+    def disk_full(directory):
+        os.makedirs(directory)
+        open(os.path.join(directory, "partial.npy"), "wb").close()
+        raise OSError(28, "No space left on device")
+
+    with pytest.raises(OSError):
+        cache.put("key", disk_full)
+    assert os.listdir(cache.directory) == []
+
+def test_damaged_cache_entry_is_dropped(tmp_path):
+    path = tmp_path / "track.csv"
+    write_ids_csv(path, [1, 2, 1, 2])
+    cache = TrajectoryCache(str(tmp_path / "cache"))
+    key = cache.key(str(path), "lon", "lat", "time")
+    cache.put(key, save_store(stream_csv(str(path), "lon", "lat", "time")))
+    column = os.path.join(cache.path(key), "time_ns.npy")
+    with open(column, "r+b") as f:
+        f.truncate(os.path.getsize(column) - 8)
+    assert cache.get(key, load_store) is None
+    assert not os.path.exists(cache.path(key))
+
+def test_eviction_keeps_the_newest_entry(tmp_path):
+    store = TrajectoryStore.from_tracks([(1, np.zeros(1000), np.zeros(1000), np.arange(1000))])
+    cache = TrajectoryCache(str(tmp_path / "cache"), max_bytes=1)
+    cache.put("old", save_store(store))
+    cache.put("new", save_store(store))
+    assert os.listdir(cache.directory) == ["new"]
@@ -0,0 +1,39 @@
+# Per-sample kinematics, in memory and streamed to disk
+
+import numpy as np
+
+from naiad_kinematics import KINEMATICS_COLUMNS, Kinematics, write_kinematics
+from naiad_tracks import TrajectoryStore
+
+def random_store(seed):
+    # Short tracks (some of one sample) with repeated times, so block seams
+    # fall on track ends and zero time steps
+    rng = np.random.default_rng(seed)
+    tracks = []
+    for t, n in enumerate(rng.integers(1, 12, rng.integers(1, 8))):
+        tracks.append((t, rng.normal(0, 0.01, n), rng.normal(0, 0.01, n), np.cumsum(rng.integers(0, 3, n)) * 10 ** 9))
+    return TrajectoryStore.from_tracks(tracks)
+
+def test_track_ends_repeat_the_segment_before():
+    # 0.001 degrees of latitude north in 1 s, then the same again in 2 s
+    store = TrajectoryStore.from_tracks([(1, [0.0, 0.0, 0.0], [0.0, 0.001, 0.002], [0, 10 ** 9, 3 * 10 ** 9]),
+                                         (2, [5.0], [5.0], [0])])
+    k = Kinematics(store)
+    metres = k.distance_m[0]
+    assert np.allclose(k.distance_m, [metres, metres, 0, 0])
+    assert np.allclose(k.speed_mps, [metres, metres / 2, metres / 2, 0])
+    assert np.allclose(k.heading_deg, [0, 0, 0, 0])
+    assert np.allclose(k.accel_mps2, [0, (metres / 2 - metres) / 1.5, 0, 0])
+
+def test_blocks_match_one_pass(tmp_path):
+    for seed in range(50):
+        store = random_store(seed)
+        whole = Kinematics(store, block=store.total_samples)
+        for block in (1, 2, 3, 5):
+            split = Kinematics(store, block=block)
+            directory = str(tmp_path / f"{seed}_{block}")
+            write_kinematics(store, directory, block=block)
+            mapped = Kinematics.load(directory)
+            for name in KINEMATICS_COLUMNS:
+                assert np.array_equal(getattr(split, name), getattr(whole, name))
+                assert np.array_equal(getattr(mapped, name), getattr(whole, name))
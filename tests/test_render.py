@@ -0,0 +1,77 @@
+# Segment index and level-of-detail pyramid
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import numpy as np
+import pygame
+
+from naiad_render import (SEGMENT_CHUNK, SPEED_COLOR_STOPS, SegmentIndex, TrailLayer, TrailPyramid, TrailShading, ViewTransform,
+                          build_color_lut)
+from naiad_tracks import TrajectoryStore
+
+def random_store(lengths, seed=0):
+    rng = np.random.default_rng(seed)
+    return TrajectoryStore.from_tracks([(t, np.cumsum(rng.normal(0, 0.05, n)), np.cumsum(rng.normal(0, 0.05, n)),
+                                         np.arange(n, dtype=np.int64)) for t, n in enumerate(lengths)])
+
+def check_index(store, index):
+    # Every chunk's box is the box of exactly its segments, and with every
+    # chunk visible the runs of a track cover all of its samples
+    for t in range(len(store)):
+        lon, lat, _ = store.track(t)
+        first, last = int(index.chunk_offsets[t]), int(index.chunk_offsets[t + 1])
+        assert last - first == -(-max(len(lon) - 1, 0) // index.chunk_size)
+        for c in range(first, last):
+            a = (c - first) * index.chunk_size
+            b = min(a + index.chunk_size + 1, len(lon))
+            assert index.lon_min[c] == lon[a:b].min() and index.lon_max[c] == lon[a:b].max()
+            assert index.lat_min[c] == lat[a:b].min() and index.lat_max[c] == lat[a:b].max()
+        visible = np.ones(len(index.lon_min), dtype=bool)
+        assert index.runs(t, visible, 0, len(lon)) == ([(0, len(lon))] if len(lon) > 1 else [])
+
+def test_chunk_counts_at_chunk_multiples():
+    for lengths in ([SEGMENT_CHUNK + 1], [3, 2 * SEGMENT_CHUNK + 1], [SEGMENT_CHUNK + 1, 1, SEGMENT_CHUNK], [1], [2]):
+        store = random_store(lengths)
+        check_index(store, SegmentIndex(store))
+
+def test_pyramid_over_random_stores():
+    for seed in range(30):
+        store = random_store([2001] * 5, seed)
+        pyramid = TrailPyramid(store, 1280, 720)
+        for level in [pyramid.full] + pyramid.levels:
+            check_index(level.store, level.index)
+
+def test_pyramid_save_and_load(tmp_path):
+    store = random_store([2001] * 5)
+    pyramid = TrailPyramid(store, 1280, 720)
+    assert pyramid.levels
+    pyramid.save(str(tmp_path))
+    loaded = TrailPyramid.load(str(tmp_path), store, 1280, 720)
+    assert [level.cell for level in loaded.levels] == [level.cell for level in pyramid.levels]
+    for level, saved in zip(loaded.levels, pyramid.levels):
+        assert np.array_equal(level.source, saved.source)
+        for name in ("offsets", "lon", "lat", "time_ns"):
+            assert np.array_equal(getattr(level.store, name), getattr(saved.store, name))
+        check_index(level.store, level.index)
+    for zoom in (0.5, 1.0, 4.0, 1000.0):
+        assert loaded.level_for(zoom).cell == pyramid.level_for(zoom).cell
+
+def test_trail_layer_seeks_match_a_fresh_draw():
+    # Shaded segments cover the same pixels however they were batched (only
+    # overlapping colours depend on brush order), so any seek must end on
+    # exactly the coverage a fresh layer draws
+    store = random_store([4000], seed=3)
+    view = ViewTransform(320, 180, zoom=8.0, pan_x=-1120, pan_y=-620)
+    shading = TrailShading(store.time_ns, build_color_lut(SPEED_COLOR_STOPS))
+    layer = TrailLayer((320, 180), checkpoint_vertices=200)
+    for k in range(0, 4001, 100):
+        layer.update(store, [k], [(255, 0, 0)], view, shading=shading)
+    assert len(layer.checkpoints) > 4
+    for k in np.random.default_rng(0).integers(0, 4001, 40).tolist():
+        layer.update(store, [k], [(255, 0, 0)], view, shading=shading)
+        fresh = TrailLayer((320, 180))
+        fresh.update(store, [k], [(255, 0, 0)], view, shading=shading)
+        assert layer.drawn == fresh.drawn
+        assert np.array_equal(pygame.surfarray.array_alpha(layer.surface), pygame.surfarray.array_alpha(fresh.surface))
+    assert [cp[0] for cp in layer.checkpoints] == sorted({cp[0] for cp in layer.checkpoints})
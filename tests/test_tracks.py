@@ -0,0 +1,32 @@
+# Track partitioning and store construction
+
+import numpy as np
+
+from naiad_tracks import TrackBuilder, partition_tracks
+
+def build(ids):
+    # One batch with times running backwards, so every track needs its samples reordered
+    n = len(ids)
+    builder = TrackBuilder()
+    builder.append(ids, np.arange(n, dtype=float), np.zeros(n), np.arange(n, dtype=np.int64)[::-1])
+    return builder.build()
+
+def test_partition_groups_by_id_then_time():
+    track_ids, order, offsets = partition_tracks(np.array([2, 1, 2, 1]), np.array([0, 5, 1, 3]))
+    assert track_ids == [1, 2]
+    assert order.tolist() == [3, 1, 0, 2]
+    assert offsets.tolist() == [0, 2, 4]
+
+def test_missing_string_ids_are_dropped():
+    for missing in (None, np.nan):
+        store = build(np.array(["b", "a", missing, "b", "a"], dtype=object))
+        assert store.track_ids == ["a", "b"]
+        assert store.offsets.tolist() == [0, 2, 4]
+        # Samples come out time-ordered within each track
+        assert store.lon.tolist() == [4.0, 1.0, 3.0, 0.0]
+
+def test_missing_numeric_ids_are_dropped():
+    store = build(np.array([1.0, np.nan, 2.0, 1.0]))
+    assert store.track_ids == [1.0, 2.0]
+    assert store.offsets.tolist() == [0, 2, 3]
+    assert store.lon.tolist() == [3.0, 0.0, 2.0]